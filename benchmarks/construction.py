@@ -0,0 +1,96 @@
+"""
+Times how long it takes to turn a page of 1,000 search results into
+Document objects.
+
+Compares the old approach, which parsed both timestamps with dateutil and
+built the resources and mentions up front, against the lazy Document, both
+untouched and with its timestamps read.
+
+    python benchmarks/construction.py
+"""
+from __future__ import print_function
+import os
+import sys
+import copy
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dateutil.parser import parse as dateparser  # noqa: E402
+from documentcloud import Document, Mention, Resource  # noqa: E402
+
+PER_PAGE = 1000
+REPEAT = 5
+
+
+def make_page():
+    return [{
+        'id': '%s-test' % i,
+        'title': 'Test %s' % i,
+        'access': 'public',
+        'pages': 10,
+        'created_at': 'Fri, 20 Nov 2015 21:17:08 +0000',
+        'updated_at': '2015-11-20T21:17:08Z',
+        'resources': {'pdf': 'https://example.com/%s.pdf' % i},
+        'mentions': [{'page': 1, 'text': 'foo'}, {'page': 2, 'text': 'bar'}],
+    } for i in range(PER_PAGE)]
+
+
+def eager(page):
+    """
+    How Documents used to be built.
+    """
+    obj_list = []
+    for d in page:
+        obj = Document(d)
+        obj.__dict__['resources'] = Resource(d.get("resources"))
+        obj.__dict__['mentions'] = [
+            Mention(i) for i in d.get("mentions", [])
+        ] or None
+        obj.__dict__['created_at'] = dateparser(d.get("created_at"))
+        obj.__dict__['updated_at'] = dateparser(d.get("updated_at"))
+        obj_list.append(obj)
+    return obj_list
+
+
+def lazy(page):
+    return [Document(d) for d in page]
+
+
+def lazy_with_timestamps(page):
+    obj_list = lazy(page)
+    for obj in obj_list:
+        obj.created_at
+        obj.updated_at
+    return obj_list
+
+
+def time_it(func, page):
+    """
+    Returns the best time out of several runs, each on a fresh copy of the
+    page since Documents take over the dictionaries they are given.
+    """
+    best = None
+    for i in range(REPEAT):
+        fresh_page = copy.deepcopy(page)
+        start = timeit.default_timer()
+        func(fresh_page)
+        seconds = timeit.default_timer() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    page = make_page()
+    baseline = None
+    for func in [eager, lazy, lazy_with_timestamps]:
+        seconds = time_it(func, page)
+        baseline = baseline or seconds
+        print("%-22s %8.2f ms per %s documents (%5.1fx)" % (
+            func.__name__,
+            seconds * 1000,
+            PER_PAGE,
+            baseline / seconds
+        ))
+
+
+if __name__ == '__main__':
+    main()
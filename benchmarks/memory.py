@@ -0,0 +1,82 @@
+"""
+Measures how much memory search results take up as ordinary Documents
+and as compact ones.
+
+Requires Python 3.
+
+    python benchmarks/memory.py
+"""
+from __future__ import print_function
+import gc
+import os
+import sys
+import json
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from documentcloud import Document  # noqa: E402
+
+COUNT = 20000
+
+
+def make_json(i):
+    """
+    Returns the JSON for a search result, as the API would.
+    """
+    return json.dumps({
+        'id': '%s-test-document' % i,
+        'title': 'Test document %s' % i,
+        'access': 'public',
+        'pages': 10,
+        'description': 'A document for testing',
+        'source': 'Los Angeles Times',
+        'language': 'eng',
+        'file_hash': '%040x' % i,
+        'canonical_url': 'https://www.documentcloud.org/documents/%s.html' % i,
+        'created_at': 'Fri, 20 Nov 2015 21:17:08 +0000',
+        'updated_at': 'Fri, 20 Nov 2015 21:17:08 +0000',
+        'contributor': 'Ben Welsh',
+        'contributor_organization': 'Los Angeles Times',
+        'data': {},
+        'resources': {
+            'pdf': 'https://assets.documentcloud.org/documents/%s.pdf' % i,
+            'text': 'https://assets.documentcloud.org/documents/%s.txt' % i,
+            'thumbnail': 'https://assets.documentcloud.org/%s.gif' % i,
+            'search': 'https://www.documentcloud.org/documents/%s/search' % i,
+            'page': {
+                'image': 'https://assets.documentcloud.org/%s-{size}.gif' % i,
+                'text': 'https://www.documentcloud.org/%s-{page}.txt' % i,
+            },
+        },
+        'mentions': [
+            {'page': 1, 'text': 'The quick brown fox'},
+            {'page': 4, 'text': 'jumps over the lazy dog'},
+        ],
+    })
+
+
+def measure(build):
+    """
+    Returns the bytes allocated per document while building a list of them.
+    """
+    gc.collect()
+    tracemalloc.start()
+    obj_list = [build(json.loads(make_json(i))) for i in range(COUNT)]
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj_list
+    return float(current) / COUNT
+
+
+def main():
+    standard = measure(Document)
+    compact = measure(Document.compact)
+    print("standard %8.0f bytes per document" % standard)
+    print("compact  %8.0f bytes per document (%.0f%% smaller)" % (
+        compact,
+        100 * (1 - compact / standard)
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Measures the client against a fake DocumentCloud running on localhost, and
+checks the results against a baseline.
+
+Covers paging through search results, building Documents, fetching a
+project's documents, uploading a file and downloading page images. The
+construction and memory benchmarks alongside this one are run too.
+
+The results are printed as JSON, or saved to a file with --output. Give a
+baseline saved earlier to --compare and the run fails if any metric is
+more than --threshold worse than it was.
+
+Requires Python 3.
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --compare baseline.json --threshold 0.2
+    python benchmarks/suite.py search upload
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import memory  # noqa: E402
+import construction  # noqa: E402
+from documentcloud import DocumentCloud  # noqa: E402
+from documentcloud.fake import FakeDocumentCloud  # noqa: E402
+
+REPEAT = 3
+CORPUS_SIZE = 5000
+PAGES = 100
+PROJECT_SIZE = 200
+UPLOAD_SIZE = 20 * 1024 * 1024
+
+#
+# The fake server
+#
+
+
+def serve(queue, **kwargs):
+    """
+    Runs a fake DocumentCloud until the process is stopped, after sending
+    back its base_uri.
+    """
+    fake = FakeDocumentCloud(**kwargs)
+    queue.put(fake.serve())
+    while True:
+        time.sleep(3600)
+
+
+class FakeServer(object):
+    """
+    A fake DocumentCloud in its own process, so its work doesn't get
+    counted against the client's time or memory.
+    """
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.process = None
+
+    def __enter__(self):
+        queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=serve,
+            args=(queue,),
+            kwargs=self.kwargs
+        )
+        self.process.daemon = True
+        self.process.start()
+        return queue.get(timeout=30)
+
+    def __exit__(self, *args):
+        self.process.terminate()
+        self.process.join()
+
+
+def best_of(func):
+    """
+    Returns the shortest time out of several runs of a function, along
+    with what the last run returned.
+    """
+    best = None
+    for i in range(REPEAT):
+        start = time.time()
+        value = func()
+        seconds = time.time() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, value
+
+
+#
+# Benchmarks
+#
+# Each returns a dictionary of its metrics, saying whether a higher or a
+# lower value is better.
+#
+
+
+def metric(value, unit, better='higher'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def bench_search(base_uri):
+    client = DocumentCloud(base_uri=base_uri)
+    seconds, obj_list = best_of(lambda: client.documents.search('salazar'))
+    return {
+        'search.documents_per_second': metric(
+            len(obj_list) / seconds,
+            'documents/s'
+        ),
+    }
+
+
+def bench_construction(base_uri):
+    page = construction.make_page()
+    return {
+        'construction.ms_per_1000': metric(
+            construction.time_it(construction.lazy, page) * 1000,
+            'ms',
+            better='lower'
+        ),
+        'construction.ms_per_1000_with_timestamps': metric(
+            construction.time_it(construction.lazy_with_timestamps, page) * 1000,
+            'ms',
+            better='lower'
+        ),
+    }
+
+
+def bench_memory(base_uri):
+    from documentcloud import Document
+    return {
+        'memory.bytes_per_document': metric(
+            memory.measure(Document),
+            'bytes',
+            better='lower'
+        ),
+        'memory.bytes_per_compact_document': metric(
+            memory.measure(Document.compact),
+            'bytes',
+            better='lower'
+        ),
+    }
+
+
+def bench_project(base_uri):
+    client = DocumentCloud('user', 'pass', base_uri=base_uri)
+    project = client.projects.create(
+        'Benchmark',
+        document_ids=[str(i) for i in range(1, PROJECT_SIZE + 1)]
+    )
+
+    def fetch():
+        # A fresh copy each time, since the list is kept once it's fetched
+        return client.projects.get(id=project.id).get_document_list()
+    seconds, obj_list = best_of(fetch)
+    return {
+        'project.documents_per_second': metric(
+            len(obj_list) / seconds,
+            'documents/s'
+        ),
+    }
+
+
+def bench_upload(base_uri):
+    client = DocumentCloud('user', 'pass', base_uri=base_uri)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'upload.pdf')
+    with open(path, 'wb') as f:
+        f.write(os.urandom(UPLOAD_SIZE))
+    try:
+        seconds, obj = best_of(lambda: client.documents.upload(path, 'Upload'))
+        # Measured on a separate run, since tracing slows everything down
+        tracemalloc.start()
+        client.documents.upload(path, 'Upload')
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.remove(path)
+        os.rmdir(directory)
+    return {
+        'upload.mb_per_second': metric(
+            UPLOAD_SIZE / seconds / 1024 / 1024,
+            'MB/s'
+        ),
+        'upload.peak_memory_mb': metric(
+            float(peak) / 1024 / 1024,
+            'MB',
+            better='lower'
+        ),
+    }
+
+
+def bench_download(base_uri):
+    client = DocumentCloud(base_uri=base_uri)
+    obj = client.documents.get('1')
+    seconds, download = best_of(lambda: list(obj.download_pages('normal')))
+    return {
+        'download.pages_per_second': metric(len(download) / seconds, 'pages/s'),
+    }
+
+
+BENCHMARKS = [
+    ('search', bench_search),
+    ('construction', bench_construction),
+    ('memory', bench_memory),
+    ('project', bench_project),
+    ('upload', bench_upload),
+    ('download', bench_download),
+]
+
+#
+# Results
+#
+
+
+def run(name_list, latency=0.0):
+    """
+    Runs the benchmarks and returns their results.
+    """
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency': latency,
+        'metrics': {},
+    }
+    with FakeServer(
+        corpus_size=CORPUS_SIZE,
+        pages=PAGES,
+        latency=latency
+    ) as base_uri:
+        for name, func in BENCHMARKS:
+            if name not in name_list:
+                continue
+            print("Running %s" % name, file=sys.stderr)
+            results['metrics'].update(func(base_uri))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints how each metric has changed since the baseline. Returns the
+    names of the ones that have gotten worse by more than the threshold.
+    """
+    regression_list = []
+    for name in sorted(results['metrics']):
+        current = results['metrics'][name]
+        try:
+            old = baseline['metrics'][name]['value']
+        except KeyError:
+            print("%-44s %12.2f %-12s (new)" % (
+                name,
+                current['value'],
+                current['unit']
+            ), file=sys.stderr)
+            continue
+        if old:
+            change = (current['value'] - old) / old
+        else:
+            change = 0.0
+        worse = -change if current['better'] == 'higher' else change
+        regressed = worse > threshold
+        if regressed:
+            regression_list.append(name)
+        print("%-44s %12.2f %-12s %+7.1f%%%s" % (
+            name,
+            current['value'],
+            current['unit'],
+            change * 100,
+            " REGRESSION" if regressed else ""
+        ), file=sys.stderr)
+    return regression_list
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument(
+        'benchmarks',
+        nargs='*',
+        help="the benchmarks to run, all of them by default: %s" % (
+            ", ".join(name for name, func in BENCHMARKS)
+        )
+    )
+    parser.add_argument(
+        '--output',
+        help="save the results to this file instead of printing them"
+    )
+    parser.add_argument(
+        '--compare',
+        help="a file of earlier results to check these against"
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.2,
+        help="how much worse a metric can get before it fails, as a fraction"
+    )
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.0,
+        help="how many seconds the fake server waits before each response"
+    )
+    options = parser.parse_args(args)
+    name_list = options.benchmarks or [name for name, func in BENCHMARKS]
+    for name in name_list:
+        if name not in dict(BENCHMARKS):
+            parser.error("There's no benchmark called %s" % name)
+    results = run(name_list, latency=options.latency)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        regression_list = compare(results, baseline, options.threshold)
+        if regression_list:
+            print("%s metrics regressed by more than %.0f%%: %s" % (
+                len(regression_list),
+                options.threshold * 100,
+                ", ".join(regression_list)
+            ), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
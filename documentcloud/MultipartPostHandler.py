@@ -101,7 +101,11 @@ class MultipartPostHandler(urllib.request.BaseHandler):
             if len(v_files) == 0:
                 data = urllib.parse.urlencode(v_vars, doseq)
             else:
-                boundary, data = self.multipart_encode(v_vars, v_files)
+                if six.PY3:
+                    # Stream the files rather than holding them in memory
+                    boundary, data = self.multipart_stream(v_vars, v_files)
+                else:
+                    boundary, data = self.multipart_encode(v_vars, v_files)
                 contenttype = 'multipart/form-data; boundary=%s' % boundary
                 if (
                     request.has_header('Content-Type') and
@@ -119,9 +123,55 @@ class MultipartPostHandler(urllib.request.BaseHandler):
                 request.add_data(data)
             except AttributeError:
                 request.data = data
+            # A streamed body can't be measured by whoever sends it, so
+            # say how long it is. This has to come after the data is set,
+            # which clears any old Content-Length.
+            if isinstance(data, MultipartBody):
+                request.add_unredirected_header(
+                    'Content-Length',
+                    str(len(data))
+                )
 
         return request
 
+    def multipart_stream(self, v_vars, files, boundary=None):
+        """
+        Like multipart_encode, but returns a MultipartBody that reads the
+        files in chunks as it is sent, so its size never matters.
+        """
+        if boundary is None:
+            boundary = choose_boundary()
+        part_list = []
+        for (key, value) in v_vars:
+            part_list.append(
+                b'--' + boundary.encode("utf-8") + b'\r\n' +
+                b'Content-Disposition: form-data; name="' +
+                key.encode("utf-8") + b'"' +
+                b'\r\n\r\n' + value.encode("utf-8") + b'\r\n'
+            )
+        for (key, fd) in files:
+            try:
+                filename = fd.name.split('/')[-1]
+            except AttributeError:
+                # Spoof a file name if the object doesn't have one.
+                # This is designed to catch when the user submits
+                # a StringIO object
+                filename = 'temp.pdf'
+            contenttype = mimetypes.guess_type(filename)[0] or \
+                'application/octet-stream'
+            part_list.append(
+                b'--' + boundary.encode("utf-8") + b'\r\n' +
+                b'Content-Disposition: form-data; ' +
+                b'name="' + key.encode("utf-8") + b'"; ' +
+                b'filename="' + filename.encode("utf-8") + b'"\r\n' +
+                b'Content-Type: ' + contenttype.encode("utf-8") + b'\r\n' +
+                b'\r\n'
+            )
+            part_list.append(fd)
+            part_list.append(b'\r\n')
+        part_list.append(b'--' + boundary.encode("utf-8") + b'--\r\n\r\n')
+        return boundary, MultipartBody(part_list)
+
     def multipart_encode(self, v_vars, files, boundary=None, buf=None):
         if six.PY3:
             if boundary is None:
@@ -198,6 +248,72 @@ class MultipartPostHandler(urllib.request.BaseHandler):
     https_request = http_request
 
 
+class MultipartBody(object):
+    """
+    A file-like multipart/form-data body that is assembled as it is read.
+
+    Strings are sent as they are. Files are read from the beginning, a chunk
+    at a time, when their turn comes. The total length is worked out up
+    front so it can be sent as the Content-Length.
+    """
+    def __init__(self, part_list):
+        self.part_list = part_list
+        self.size_list = [
+            getsize(i) if hasattr(i, 'read') else len(i) for i in part_list
+        ]
+        self.seek(0)
+
+    def __len__(self):
+        return sum(self.size_list)
+
+    def __iter__(self):
+        self.seek(0)
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def seek(self, offset, whence=0):
+        """
+        Goes back to the start, so the body can be sent again.
+        """
+        if offset != 0 or whence != 0:
+            raise ValueError("A MultipartBody can only be rewound to 0")
+        self._index = 0
+        self._offset = 0
+        self._position = 0
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        """
+        Returns up to `size` bytes of the body, or everything that's left.
+        """
+        if size is None or size < 0:
+            size = len(self) - self._position
+        chunk_list = []
+        while size > 0 and self._index < len(self.part_list):
+            part = self.part_list[self._index]
+            part_size = self.size_list[self._index]
+            n = min(size, part_size - self._offset)
+            if hasattr(part, 'read'):
+                if self._offset == 0:
+                    part.seek(0)
+                chunk = part.read(n)
+            else:
+                chunk = part[self._offset:self._offset + n]
+            chunk_list.append(chunk)
+            self._offset += len(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+            if self._offset >= part_size or not chunk:
+                self._index += 1
+                self._offset = 0
+        return b''.join(chunk_list)
+
+
 def getsize(o_file):
     """
     get the size, either by seeeking to the end.
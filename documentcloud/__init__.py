@@ -18,13 +18,23 @@ import sys
 import six
 import json
 import copy
+import time
 import base64
-from .toolbox import retry
+import datetime
+import threading
+from .toolbox import bounded_map
+from .toolbox import BulkResult
+from .toolbox import parse_timestamp
+from .toolbox import RetryPolicy
+from .toolbox import RateLimiter
 from .toolbox import DoesNotExistError
 from .toolbox import DuplicateObjectError
+from .toolbox import UploadFailedError
 from .toolbox import credentials_required
 from .toolbox import CredentialsFailedError
-from dateutil.parser import parse as dateparser
+from .batch import WriteBatch
+from .ledger import get_file_hash
+from .transport import ConnectionPool
 from .MultipartPostHandler import MultipartPostHandler, PostHandler
 if six.PY3:
     import urllib.parse
@@ -44,15 +54,34 @@ class BaseDocumentCloudClient(object):
     """
     BASE_URI = 'https://www.documentcloud.org/api/'
 
-    def __init__(self, username, password, base_uri=None):
+    def __init__(
+        self, username, password, base_uri=None, transport=None,
+        retry_policy=None, rate_limiter=None, cache=None, compact=False,
+        asset_store=None
+    ):
         self.BASE_URI = base_uri or BaseDocumentCloudClient.BASE_URI
         self.username = username
         self.password = password
-
-    @retry(Exception, tries=3)
-    def _make_request(self, url, params=None, opener=None):
+        # Keep-alive connections and the retry budget are shared by every
+        # client that is handed the same objects, so only create them if
+        # we weren't given them.
+        self.transport = transport or ConnectionPool()
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Requests are only throttled, and responses only cached, if we
+        # are asked to.
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.asset_store = asset_store
+        # Whether to build objects with the memory-saving layout
+        self.compact = compact
+
+    def _make_request(self, url, params=None, opener=None, idempotent=True):
         """
         Configure a HTTP request, fire it off and return the response.
+
+        Almost everything is POSTed, whether or not it changes anything, so
+        requests that mustn't be sent twice, like uploads, have to say so by
+        passing idempotent=False.
         """
         # Create the request object
         args = [i for i in [url, params] if i]
@@ -60,21 +89,31 @@ class BaseDocumentCloudClient(object):
         # If the client has credentials, include them as a header
         if self.username and self.password:
             credentials = '%s:%s' % (self.username, self.password)
-            encoded_credentials = base64.encodestring(
+            encoded_credentials = base64.b64encode(
                 credentials.encode("utf-8")
-            ).decode("utf-8").replace("\n", "")
+            ).decode("utf-8")
             header = 'Basic %s' % encoded_credentials
             request.add_header('Authorization', header)
         # If the request provides a custom opener, like the upload request,
-        # which relies on a multipart request, it is applied here.
+        # which relies on a multipart request, it is used to encode the body.
         if opener:
-            opener = urllib.request.build_opener(opener)
-            request_method = opener.open
-        else:
-            request_method = urllib.request.urlopen
-        # Make the request
+            request = opener().http_request(request)
+        # Make the request, retrying if it fails for a passing reason. The
+        # transport is told too, so it knows whether it can resend it.
+        request.idempotent = idempotent
+        return self.retry_policy.call(
+            self._send_request,
+            request,
+            idempotent=idempotent
+        )
+
+    def _urlopen(self, request):
+        """
+        Open a request with the transport, translating the errors that
+        mean something to us.
+        """
         try:
-            response = request_method(request)
+            return self.transport.urlopen(request)
         except Exception:
             e = sys.exc_info()[1]
             if getattr(e, 'code', None) == 404:
@@ -85,8 +124,166 @@ not exist or is unavailable without the proper credentials.")
 requires proper credentials.")
             else:
                 raise e
+
+    def _send_request(self, request, throttle=True):
+        """
+        Send a prepared request and return the content of the response.
+        """
+        if throttle and self.rate_limiter:
+            self.rate_limiter.acquire()
+        # A streamed body has to be rewound if this is a retry
+        if hasattr(request.data, 'seek'):
+            request.data.seek(0)
+        # If we have a copy of the response, only ask for it if it changed
+        entry = None
+        if self.cache and request.get_method() == 'GET':
+            url = request.get_full_url()
+            vary = request.get_header('Authorization')
+            entry = self.cache.get(url, vary)
+            if entry:
+                for key, value in entry.get_conditional_headers().items():
+                    request.add_unredirected_header(key, value)
+        response = self._urlopen(request)
         # Read the response and return it
-        return response.read()
+        if entry and response.status == 304:
+            response.read()
+            return self.cache.hit(entry)
+        content = response.read()
+        if self.cache and request.get_method() == 'GET':
+            self.cache.set(url, content, response.headers, vary)
+        return content
+
+    def download(self, url):
+        """
+        Download the contents of an url, like a document's text or images.
+
+        Unlike API requests, these are not throttled by the rate limiter.
+        If the client has an asset store, anything already in it is read
+        from disk instead, without checking whether it has changed.
+        """
+        if self.asset_store:
+            content = self.asset_store.get(url)
+            if content is not None:
+                return content
+        request = urllib.request.Request(url)
+        content = self.retry_policy.call(
+            self._send_request,
+            request,
+            throttle=False
+        )
+        if self.asset_store:
+            self.asset_store.set(url, content)
+        return content
+
+    @staticmethod
+    def _get_validator(response):
+        """
+        Returns the ETag or Last-Modified date that identifies the version
+        of an asset in a response, or None if it doesn't have one that can
+        be used to resume it.
+        """
+        etag = response.headers.get('ETag')
+        # Weak ETags can't be used to stitch byte ranges together
+        if etag and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('Last-Modified')
+
+    @staticmethod
+    def _is_continuation(response, position):
+        """
+        Tests whether a response is the rest of an asset from a position.
+        """
+        if response.status != 206:
+            return False
+        match = re.match(
+            r'^bytes (\d+)-',
+            response.headers.get('Content-Range') or ''
+        )
+        return match is not None and int(match.group(1)) == position
+
+    def download_to(self, url, f, offset=0, chunk_size=64 * 1024,
+                    validator=None, on_validator=None):
+        """
+        Stream the contents of an url into a file object, one chunk at a
+        time, so it never has to fit in memory.
+
+        If the file already holds the first `offset` bytes, only the rest
+        are requested. Pass the ETag or Last-Modified date they came with as
+        the validator, and if the asset has changed since, it's downloaded
+        from the start instead. A download that breaks off partway is
+        retried from where it stopped.
+
+        The validator of the version being downloaded is passed to the
+        on_validator callback, if there is one, as soon as it's known, so
+        it can be saved for resuming later. Returns the number of bytes
+        written.
+        """
+        # Where the first byte of the download belongs in the file
+        base = f.tell() - offset
+        state = {
+            'start': offset,
+            'position': offset,
+            'validator': validator,
+        }
+
+        def _restart():
+            f.seek(base)
+            f.truncate()
+            state['start'] = state['position'] = 0
+
+        def _open():
+            position = state['position']
+            request = urllib.request.Request(url)
+            if position:
+                request.add_header('Range', 'bytes=%s-' % position)
+                # Only send the rest if it's still the same asset
+                if state['validator']:
+                    request.add_header('If-Range', state['validator'])
+            try:
+                response = self._urlopen(request)
+            except urllib.error.HTTPError as e:
+                # There's nothing left to send
+                if e.code == 416 and position:
+                    return None
+                raise
+            if position and not self._is_continuation(response, position):
+                _restart()
+                # The server sent the whole asset, or it has changed since
+                # we started, so start over
+                if response.status != 200:
+                    response.close()
+                    return _open()
+            if not state['position']:
+                state['validator'] = self._get_validator(response)
+                if on_validator:
+                    on_validator(state['validator'])
+            return response
+
+        def _stream():
+            response = _open()
+            if response is None:
+                return
+            try:
+                if six.PY3:
+                    buf = memoryview(bytearray(chunk_size))
+                while True:
+                    if six.PY3:
+                        n = response.readinto(buf)
+                        if not n:
+                            break
+                        f.write(buf[:n])
+                    else:
+                        chunk = response.read(chunk_size)
+                        if not chunk:
+                            break
+                        n = len(chunk)
+                        f.write(chunk)
+                    state['position'] += n
+            finally:
+                response.close()
+
+        self.retry_policy.call(_stream)
+        return state['position'] - state['start']
 
     @credentials_required
     def put(self, method, params):
@@ -154,31 +351,111 @@ class DocumentCloud(BaseDocumentCloudClient):
     """
     The public interface for the DocumentCloud API
     """
-    def __init__(self, username=None, password=None, base_uri=None):
-        super(DocumentCloud, self).__init__(username, password, base_uri)
+    def __init__(self, username=None, password=None, base_uri=None, **kwargs):
+        super(DocumentCloud, self).__init__(
+            username,
+            password,
+            base_uri,
+            **kwargs
+        )
+        # The sub-clients share our transport and policies
+        kwargs = dict(
+            transport=self.transport,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            cache=self.cache,
+            compact=self.compact,
+            asset_store=self.asset_store,
+        )
         self.documents = DocumentClient(
             self.username,
-            self.password, self, base_uri
+            self.password,
+            self,
+            base_uri,
+            **kwargs
         )
         self.projects = ProjectClient(
             self.username,
             self.password,
             self,
-            base_uri
+            base_uri,
+            **kwargs
         )
+        # How many times saving an object was skipped because nothing
+        # about it had changed
+        self.skipped_writes = 0
+        self._lock = threading.Lock()
+        # Each thread has its own batch, so one thread's batch doesn't
+        # swallow the saves of another using the same client
+        self._local = threading.local()
+
+    def _get_write_batch(self):
+        return getattr(self._local, 'write_batch', None)
+
+    def _set_write_batch(self, batch):
+        self._local.write_batch = batch
+    _write_batch = property(_get_write_batch, _set_write_batch)
+
+    def _skip_write(self):
+        with self._lock:
+            self.skipped_writes += 1
+
+    def batch(self, workers=4, max_size=100):
+        """
+        Returns a context manager that holds back saves and deletes of
+        Documents and Projects, then sends them all at once.
+
+        Repeated saves of the same object are combined into one request.
+        The writes are sent with a pool of workers when the block ends, or
+        sooner if `max_size` objects are waiting. Only saves and deletes
+        made by the thread that opened the batch are held back.
+
+        Example usage:
+
+            >> with documentcloud.batch(workers=8):
+            >>     obj = documentcloud.documents.get('71072-oir-final-report')
+            >>     obj.title = 'Final report'
+            >>     obj.save()
+            >>     obj.data['topic'] = 'police'
+            >>     obj.save()
+        """
+        return WriteBatch(self, workers=workers, max_size=max_size)
+
+    def _queue_write(self, obj, delete=False):
+        """
+        Adds a write to the current batch. Returns False if there isn't one.
+        """
+        batch = self._write_batch
+        if batch is None:
+            return False
+        batch.add(obj, delete=delete)
+        return True
 
 
 class DocumentClient(BaseDocumentCloudClient):
     """
     Methods for collecting documents
     """
-    def __init__(self, username, password, connection, base_uri=None):
-        super(DocumentClient, self).__init__(username, password, base_uri)
+    def __init__(self, username, password, connection, base_uri=None,
+                 **kwargs):
+        super(DocumentClient, self).__init__(username, password, base_uri, **kwargs)
         # We want to have the connection around on all Document objects
         # this client creates in case the instance needs to hit the API
         # later. Storing it will preserve the credentials.
         self._connection = connection
 
+    def _make_document(self, d):
+        """
+        Converts the JSON for a document from the API into a Document.
+        """
+        # We want to have the connection around on all Document objects
+        # this client creates in case the instance needs to hit the API
+        # later.
+        d['_connection'] = self._connection
+        if self.compact:
+            return Document.compact(d)
+        return Document(d)
+
     def is_url(self, value):
         """
         Test if a pdf being submitted is a valid URL
@@ -192,7 +469,7 @@ class DocumentClient(BaseDocumentCloudClient):
                 r'(?:/?|[/?]\S+)$', re.IGNORECASE)
         return re.match(regex, value) is not None
 
-    def _get_search_page(
+    def _get_search_response(
         self,
         query,
         page,
@@ -201,7 +478,8 @@ class DocumentClient(BaseDocumentCloudClient):
         data=False,
     ):
         """
-        Retrieve one page of search results from the DocumentCloud API.
+        Retrieve one page of search results from the DocumentCloud API,
+        along with the total number of hits and other metadata.
         """
         if mentions > 10:
             raise ValueError("You cannot search for more than 10 mentions")
@@ -213,57 +491,195 @@ class DocumentClient(BaseDocumentCloudClient):
         }
         if data:
             params['data'] = 'true'
-        response = self.fetch('search.json', params)
+        return self.fetch('search.json', params)
+
+    def _get_search_page(self, query, page, **kwargs):
+        """
+        Retrieve one page of search results from the DocumentCloud API.
+        """
+        response = self._get_search_response(query, page, **kwargs)
         return response.get("documents")
 
-    def search(self, query, page=None, per_page=1000, mentions=3, data=False):
+    def search(
+        self, query, page=None, per_page=1000, mentions=3, data=False,
+        workers=None, hydrate=False
+    ):
         """
         Retrieve all objects that make a search query.
 
         Will loop through all pages that match unless you provide
         the number of pages you'd like to restrict the search to.
 
+        Provide a number of workers to fetch the pages after the first
+        concurrently. The results still come back in page order.
+
+        Search results leave out some metadata, like the contributor and
+        annotations, which is fetched one document at a time when first
+        used. Set hydrate to True and the first time it's needed it will be
+        fetched for all of the results at once.
+
         Example usage:
 
             >> documentcloud.documents.search('salazar')
+            >> documentcloud.documents.search('salazar', workers=8)
+            >> documentcloud.documents.search('salazar', hydrate=True)
         """
-        # If the user provides a page, search it and stop there
-        if page:
-            document_list = self._get_search_page(
+        # If the user doesn't provide a page but wants them fetched
+        # concurrently, work out how many there are and go get them
+        if not page and workers and workers > 1:
+            return self._search_concurrently(
                 query,
-                page=page,
                 per_page=per_page,
                 mentions=mentions,
                 data=data,
+                workers=workers,
+                hydrate=hydrate,
             )
         # If the user doesn't provide a page keep looping until you have
         # everything
-        else:
-            page = 1
-            document_list = []
-            # Loop through all the search pages and fetch everything
-            while True:
-                results = self._get_search_page(
-                    query,
-                    page=page,
-                    per_page=per_page,
-                    mentions=mentions,
-                    data=data,
-                )
-                if results:
-                    document_list += results
-                    page += 1
-                else:
-                    break
+        if not page:
+            obj_list = list(self.iter_search(
+                query,
+                per_page=per_page,
+                mentions=mentions,
+                data=data,
+            ))
+            if hydrate:
+                self._batch(obj_list)
+            return obj_list
+        # If the user provides a page, search it and stop there
+        document_list = self._get_search_page(
+            query,
+            page=page,
+            per_page=per_page,
+            mentions=mentions,
+            data=data,
+        )
         # Convert the JSON objects from the API into Python objects
-        obj_list = []
-        for doc in document_list:
-            doc['_connection'] = self._connection
-            obj = Document(doc)
-            obj_list.append(obj)
+        obj_list = [self._make_document(doc) for doc in document_list]
+        if hydrate:
+            self._batch(obj_list)
         # Pass it back out
         return obj_list
 
+    def iter_search(
+        self, query, per_page=1000, mentions=3, data=False, limit=None
+    ):
+        """
+        Yield the objects that make a search query one at a time.
+
+        Pages are only requested as the results are consumed, so only a single
+        page is held in memory and breaking out of the loop early stops the
+        paging. Provide a limit to stop after that many results.
+
+        Example usage:
+
+            >> for doc in documentcloud.documents.iter_search('salazar'):
+            >>     print(doc.title)
+        """
+        # No sense asking for more than we're going to keep
+        if limit:
+            per_page = min(per_page, limit)
+        page = 1
+        count = 0
+        while True:
+            response = self._get_search_response(
+                query,
+                page=page,
+                per_page=per_page,
+                mentions=mentions,
+                data=data,
+            )
+            results = response.get("documents")
+            if not results:
+                return
+            for doc in results:
+                yield self._make_document(doc)
+                count += 1
+                if limit and count >= limit:
+                    return
+            # If the API tells us how many hits there are, don't waste a
+            # request on the empty page after the last one. The server may
+            # send shorter pages than we asked for, so go by what it sent.
+            total = response.get("total")
+            if total is not None and count >= total:
+                return
+            page += 1
+
+    def _search_concurrently(
+        self, query, per_page=1000, mentions=3, data=False, workers=4,
+        hydrate=False
+    ):
+        """
+        Retrieve all objects that make a search query, using the total from
+        the first page to fetch the rest with a pool of workers.
+        """
+        kwargs = dict(per_page=per_page, mentions=mentions, data=data)
+        response = self._get_search_response(query, page=1, **kwargs)
+        document_list = response.get("documents") or []
+        total = response.get("total")
+        # Without a total to go on, fall back to paging one at a time
+        if total is None:
+            obj_list = list(self.iter_search(query, **kwargs))
+            if hydrate:
+                self._batch(obj_list)
+            return obj_list
+        # Only bother with the others if the first page was full
+        if document_list and len(document_list) < total:
+            page_count = -(-total // len(document_list))
+            page_list = bounded_map(
+                lambda page: self._get_search_page(query, page, **kwargs),
+                range(2, page_count + 1),
+                workers=workers,
+            )
+            for results in page_list:
+                document_list.extend(results or [])
+        # Convert the JSON objects from the API into Python objects
+        obj_list = [self._make_document(doc) for doc in document_list]
+        if hydrate:
+            self._batch(obj_list)
+        return obj_list
+
+    def _batch(self, obj_list):
+        """
+        Links a list of documents together, so that the first one to need
+        its lazy loaded fields hydrates all of them.
+        """
+        for obj in obj_list:
+            if not obj.is_hydrated():
+                obj.__dict__['_batch'] = obj_list
+
+    def hydrate(self, obj_list, fields=None, workers=8):
+        """
+        Fill in the metadata search results leave out for a list of
+        documents, fetching it concurrently with a pool of workers.
+
+        Only the documents missing one of the fields are requested. By
+        default that's any of the contributor, contributor_organization,
+        data, annotations and sections.
+
+        Returns the list.
+
+        Example usage:
+
+            >> obj_list = documentcloud.documents.search('salazar')
+            >> documentcloud.documents.hydrate(obj_list, fields=['contributor'])
+        """
+        missing = [obj for obj in obj_list if not obj.is_hydrated(fields)]
+        d_list = bounded_map(
+            lambda obj: self.fetch('documents/%s.json' % obj.id).get("document"),
+            missing,
+            workers=workers,
+        )
+        for obj, d in zip(missing, d_list):
+            obj._hydrate(d)
+        # Documents that had everything already don't need their batch,
+        # and holding on to it would keep the whole list alive
+        for obj in obj_list:
+            if obj.is_hydrated():
+                obj.__dict__.pop('_batch', None)
+        return obj_list
+
     def get(self, id):
         """
         Retrieve a particular document using it's unique identifier.
@@ -273,14 +689,13 @@ class DocumentClient(BaseDocumentCloudClient):
             >> documentcloud.documents.get('71072-oir-final-report')
         """
         data = self.fetch('documents/%s.json' % id).get("document")
-        data['_connection'] = self._connection
-        return Document(data)
+        return self._make_document(data)
 
     @credentials_required
     def upload(
         self, pdf, title=None, source=None, description=None,
         related_article=None, published_url=None, access='private',
-        project=None, data=None, secure=False, force_ocr=False
+        project=None, data=None, secure=False, force_ocr=False, ledger=None
     ):
         """
         Upload a PDF or other image file to DocumentCloud.
@@ -302,9 +717,34 @@ class DocumentClient(BaseDocumentCloudClient):
 
         Returns the document that's created as a Document object.
 
+        If an UploadLedger is provided, a file whose contents have already
+        been uploaded isn't sent again. The existing document is returned.
+
         Based on code developed by Mitchell Kotler and
         refined by Christopher Groskopf.
         """
+        # Check if this file has gone up before. The hash is claimed while
+        # we do, so a copy going up at the same time isn't sent twice.
+        is_file = hasattr(pdf, 'read') or not self.is_url(pdf)
+        if ledger is not None and is_file:
+            file_hash = get_file_hash(pdf)
+            with ledger.claim(file_hash):
+                document_id = ledger.get(file_hash)
+                if document_id:
+                    try:
+                        return self.get(document_id)
+                    except DoesNotExistError:
+                        # It's since been deleted, so send it again
+                        ledger.remove(file_hash)
+                obj = self.upload(
+                    pdf, title=title, source=source, description=description,
+                    related_article=related_article,
+                    published_url=published_url, access=access,
+                    project=project, data=data, secure=secure,
+                    force_ocr=force_ocr
+                )
+                ledger.add(file_hash, getattr(pdf, 'name', pdf), obj.id)
+                return obj
         # Required pdf parameter
         if hasattr(pdf, 'read'):
             try:
@@ -355,12 +795,18 @@ and try again.")
             params['secure'] = 'true'
         if force_ocr:
             params['force_ocr'] = 'true'
-        # Make the request
-        response = self._make_request(
-            self.BASE_URI + 'upload.json',
-            params,
-            opener=opener
-        )
+        # Make the request. The file is streamed up as the request is sent,
+        # so if we opened it we can close it once that's done.
+        try:
+            response = self._make_request(
+                self.BASE_URI + 'upload.json',
+                params,
+                opener=opener,
+                idempotent=False
+            )
+        finally:
+            if params['file'] is not pdf:
+                params['file'].close()
         # Pull the id from the response
         response_id = json.loads(response.decode("utf-8"))['id'].split("-")[0]
         # Get the document and return it
@@ -370,17 +816,32 @@ and try again.")
     def upload_directory(
         self, path, source=None, description=None,
         related_article=None, published_url=None, access='private',
-        project=None, data=None, secure=False, force_ocr=False
+        project=None, data=None, secure=False, force_ocr=False, workers=1,
+        manifest=None, ledger=None
     ):
         """
         Uploads all the PDFs in the provided directory.
 
+        Provide a number of workers to upload several files at once, and the
+        path to a manifest file to record the outcome of each upload as JSON.
+        Provide an UploadLedger to skip files that have already been uploaded,
+        so an interrupted run can be resumed.
+
         Example usage:
 
             >> documentcloud.documents.upload_directory("/home/ben/pdfs/")
+            >> documentcloud.documents.upload_directory(
+            >>  "/home/ben/pdfs/",
+            >>  workers=8,
+            >>  manifest="/home/ben/pdfs.json"
+            >>)
 
         Returns a list of the documents created during the upload.
 
+        A file that fails to upload doesn't stop the others. Once they've all
+        been tried, an UploadFailedError is raised listing the failures,
+        along with the documents that did upload.
+
         Based on code developed by Mitchell Kotler and refined
         by Christopher Groskopf.
         """
@@ -391,19 +852,105 @@ and try again.")
                 os.path.join(dirpath, i) for i in filenames
                 if i.lower().endswith(".pdf")
             ])
+
+        def _upload(pdf_path):
+            try:
+                obj = self.upload(
+                    pdf_path, source=source, description=description,
+                    related_article=related_article,
+                    published_url=published_url, access=access,
+                    project=project, data=data, secure=secure,
+                    force_ocr=force_ocr, ledger=ledger
+                )
+            except Exception as e:
+                return pdf_path, None, e
+            return pdf_path, obj, None
+
         # Upload all the pdfs
         obj_list = []
-        for pdf_path in path_list:
-            obj = self.upload(
-                pdf_path, source=source, description=description,
-                related_article=related_article, published_url=published_url,
-                access=access, project=project, data=data, secure=secure,
-                force_ocr=force_ocr
+        error_dict = {}
+        manifest_dict = {}
+        for pdf_path, obj, error in bounded_map(_upload, path_list, workers):
+            if error:
+                error_dict[pdf_path] = error
+                manifest_dict[pdf_path] = {'id': None, 'error': str(error)}
+            else:
+                obj_list.append(obj)
+                manifest_dict[pdf_path] = {'id': obj.id, 'error': None}
+        # Record what happened to each file
+        if manifest:
+            with open(manifest, 'w') as f:
+                json.dump(manifest_dict, f, indent=2, sort_keys=True)
+        if error_dict:
+            raise UploadFailedError(
+                "%s of %s files failed to upload" % (
+                    len(error_dict),
+                    len(path_list)
+                ),
+                documents=obj_list,
+                errors=error_dict
             )
-            obj_list.append(obj)
         # Pass back the list of documents
         return obj_list
 
+    @credentials_required
+    def bulk_update(self, changes, workers=4, rate=None):
+        """
+        Saves changes to many documents at once.
+
+        Accepts an iterable of Documents that have been edited, or of
+        (id, fields) pairs with the new values of any of the fields `put`
+        allows to be edited. The requests are sent by a pool of workers. If
+        you provide a rate, they will also be held to that many per second.
+
+        Documents with nothing changed are skipped. A document that fails
+        to save doesn't stop the others.
+
+        Returns a BulkResult listing what happened to each document and how
+        fast they went.
+
+        Example usage:
+
+            >> obj_list = documentcloud.documents.search('salazar')
+            >> for obj in obj_list:
+            >>     obj.data['topic'] = 'interior'
+            >> result = documentcloud.documents.bulk_update(obj_list, workers=8)
+            >> result.errors
+            >> result.stats()
+        """
+        limiter = RateLimiter(rate) if rate else None
+
+        def _update(item):
+            if isinstance(item, Document):
+                id = item.id
+            else:
+                id, fields = item
+            try:
+                if isinstance(item, Document):
+                    params = item.get_changes()
+                else:
+                    params = dict(fields)
+                    if 'data' in params:
+                        params['data'] = DocumentDataDict(params['data'])
+                if not params:
+                    self._connection._skip_write()
+                    return id, False
+                if limiter:
+                    limiter.acquire()
+                self.put('documents/%s.json' % id, dict(params))
+                if isinstance(item, Document):
+                    item._mark_saved()
+            except Exception as e:
+                return id, e
+            return id, True
+
+        result = BulkResult()
+        start = time.time()
+        for id, outcome in bounded_map(_update, changes, workers):
+            result.add(id, outcome)
+        result.seconds = time.time() - start
+        return result
+
     @credentials_required
     def delete(self, id):
         """
@@ -419,12 +966,34 @@ class ProjectClient(BaseDocumentCloudClient):
     """
     Methods for collecting projects
     """
-    def __init__(self, username, password, connection, base_uri=None):
-        super(ProjectClient, self).__init__(username, password, base_uri)
+    def __init__(self, username, password, connection, base_uri=None,
+                 **kwargs):
+        super(ProjectClient, self).__init__(username, password, base_uri, **kwargs)
         # We want to have the connection around on all Document objects
         # this client creates in case the instance needs to hit the API
         # later. Storing it will preserve the credentials.
         self._connection = connection
+        # How many seconds the list of projects is kept around to look
+        # them up by id or title. Set it to zero to always fetch it.
+        self.index_ttl = 60
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _make_project(self, d):
+        """
+        Converts the JSON for a project from the API into a Project.
+        """
+        # Copy it all the way down, so that the index keeps what the API
+        # sent however the project's lists are changed
+        d = copy.deepcopy(d)
+        d['_connection'] = self._connection
+        if self.compact:
+            return Project.compact(d)
+        return Project(d)
+
+    @staticmethod
+    def _normalize_title(title):
+        return (title or '').lower().strip()
 
     @credentials_required
     def all(self):
@@ -436,12 +1005,38 @@ class ProjectClient(BaseDocumentCloudClient):
             >> documentcloud.projects.all()
         """
         project_list = self.fetch('projects.json').get("projects")
-        obj_list = []
+        # Refresh the index that lookups by id and title use
+        id_dict = {}
+        title_dict = {}
         for proj in project_list:
-            proj['_connection'] = self._connection
-            proj = Project(proj)
-            obj_list.append(proj)
-        return obj_list
+            id_dict[str(proj['id'])] = proj
+            title_dict.setdefault(
+                self._normalize_title(proj.get('title')),
+                []
+            ).append(proj)
+        with self._lock:
+            self._index = (time.time(), id_dict, title_dict)
+        return [self._make_project(proj) for proj in project_list]
+
+    def _get_index(self):
+        """
+        Returns the projects keyed by id and by title, downloading them
+        again if the index has expired.
+        """
+        with self._lock:
+            index = self._index
+        if index is None or index[0] + self.index_ttl <= time.time():
+            self.all()
+            with self._lock:
+                index = self._index
+        return index[1], index[2]
+
+    def invalidate(self):
+        """
+        Forget the list of projects, so the next lookup downloads it again.
+        """
+        with self._lock:
+            self._index = None
 
     def get(self, id=None, title=None):
         """
@@ -450,6 +1045,10 @@ class ProjectClient(BaseDocumentCloudClient):
 
         But not both.
 
+        The list of projects is downloaded once and reused for lookups
+        over the next `index_ttl` seconds, or until a project is created,
+        edited or deleted.
+
         Example usage:
 
             >> documentcloud.projects.get('arizona-shootings')
@@ -462,20 +1061,18 @@ class ProjectClient(BaseDocumentCloudClient):
             raise ValueError("You must provide an id or a title to \
                 make a request.")
         # Pull the hits
+        id_dict, title_dict = self._get_index()
         if id:
-            hit_list = [i for i in self.all() if str(i.id) == str(id)]
+            hit_list = [id_dict[str(id)]] if str(id) in id_dict else []
         elif title:
-            hit_list = [
-                i for i in self.all() if
-                i.title.lower().strip() == title.lower().strip()
-            ]
+            hit_list = title_dict.get(self._normalize_title(title), [])
         # Throw an error if there's more than one hit.
         if len(hit_list) > 1:
             raise DuplicateObjectError("There is more than one project that \
                 matches your request.")
         # Try to pull the first hit
         try:
-            return hit_list[0]
+            return self._make_project(hit_list[0])
         except IndexError:
             # If it's not there, you know to throw this error.
             raise DoesNotExistError("The resource you've requested does not \
@@ -521,8 +1118,10 @@ class ProjectClient(BaseDocumentCloudClient):
             ])
         response = self._make_request(
             self.BASE_URI + "projects.json",
-            params.encode("utf-8")
+            params.encode("utf-8"),
+            idempotent=False
         )
+        self.invalidate()
         new_id = json.loads(response.decode("utf-8"))['project']['id']
         # If it doesn't exist, that suggests the project already exists
         if not new_id:
@@ -557,6 +1156,7 @@ class ProjectClient(BaseDocumentCloudClient):
             'projects/%s.json' % id,
             {'_method': 'delete'},
         )
+        self.invalidate()
 
 #
 # API objects
@@ -568,9 +1168,74 @@ class BaseAPIObject(object):
     """
     An abstract version of the objects returned by the API.
     """
+    # Fields whose values repeat so often across objects that it's worth
+    # keeping one copy of each in compact mode
+    INTERNED_FIELDS = ()
+    # Fields that can be edited and saved back to DocumentCloud. Their
+    # original values are remembered the first time they are changed.
+    EDITABLE_FIELDS = ()
+
     def __init__(self, d):
         self.__dict__ = d
 
+    def __setattr__(self, attr, value):
+        if attr in self.EDITABLE_FIELDS:
+            saved = self.__dict__.setdefault('_saved', {})
+            if attr not in saved:
+                saved[attr] = self.__dict__.get(attr)
+        object.__setattr__(self, attr, value)
+
+    def _get_changed_fields(self):
+        """
+        Returns the editable fields whose values are different from the ones
+        DocumentCloud has.
+        """
+        saved = self.__dict__.get('_saved') or {}
+        return [
+            attr for attr, value in saved.items()
+            if self.__dict__.get(attr) != value
+        ]
+
+    def __copy__(self):
+        """
+        Returns a copy that can be edited and saved apart from the original.
+
+        The changes waiting to be saved, and the editable objects inside it,
+        are copied rather than shared. The copy is loaded on its own, not
+        along with the original's batch.
+        """
+        obj = self.__class__.__new__(self.__class__)
+        attrs = obj.__dict__
+        for key, value in self.__dict__.items():
+            if key == '_batch':
+                continue
+            # Resources are still a plain dictionary until they're used
+            if isinstance(value, (BaseAPIObject, dict)):
+                value = copy.copy(value)
+            attrs[key] = value
+        return obj
+
+    @classmethod
+    def compact(cls, d):
+        """
+        Builds the object with a more compact memory layout, for when
+        there will be lots of them.
+
+        Rather than adopting the dictionary from the API, the fields are
+        copied one by one into the object's own attribute dictionary. In
+        CPython, objects of the same class filled that way share a single
+        table of keys and only store their values. The object works
+        exactly the same either way.
+        """
+        obj = cls.__new__(cls)
+        attrs = obj.__dict__
+        for key, value in d.items():
+            if six.PY3 and key in cls.INTERNED_FIELDS and \
+                    isinstance(value, str):
+                value = sys.intern(value)
+            attrs[key] = value
+        return obj
+
     def __repr__(self):
         return '<%s: %s>' % (self.__class__.__name__, self.__str__())
 
@@ -637,13 +1302,108 @@ class DocumentDataDict(dict):
 class Document(BaseAPIObject):
     """
     A document returned by the API.
+
+    The timestamps, resources and mentions in the API's JSON are converted
+    into Python objects the first time they are accessed, rather than when
+    the Document is created, so big lists of search results are quick
+    to build.
     """
+    INTERNED_FIELDS = (
+        'access',
+        'language',
+        'contributor',
+        'contributor_organization',
+        'source',
+    )
+    EDITABLE_FIELDS = (
+        'title',
+        'source',
+        'description',
+        'access',
+        'data',
+    )
+    # Fields search results leave out, which are fetched when first used
+    LAZY_FIELDS = (
+        'contributor',
+        'contributor_organization',
+        'data',
+        'annotations',
+        'sections',
+    )
+
     def __init__(self, d):
         self.__dict__ = d
-        self.resources = Resource(d.get("resources"))
-        self.mentions = [Mention(i) for i in d.get("mentions", [])] or None
-        self.created_at = dateparser(d.get("created_at"))
-        self.updated_at = dateparser(d.get("updated_at"))
+
+    @classmethod
+    def compact(cls, d):
+        """
+        Builds the Document with a more compact memory layout, along
+        with its resources and mentions.
+        """
+        obj = super(Document, cls).compact(d)
+        attrs = obj.__dict__
+        if isinstance(attrs.get('resources'), dict):
+            attrs['resources'] = Resource.compact(attrs['resources'])
+        if attrs.get('mentions'):
+            attrs['mentions'] = [Mention.compact(i) for i in attrs['mentions']]
+        return obj
+
+    #
+    # Conversions
+    #
+
+    def get_created_at(self):
+        """
+        Returns when the document was created as a datetime.
+        """
+        value = self.__dict__.get('created_at')
+        if not isinstance(value, datetime.datetime):
+            value = self.__dict__['created_at'] = parse_timestamp(value)
+        return value
+
+    def set_created_at(self, value):
+        self.__dict__['created_at'] = value
+    created_at = property(get_created_at, set_created_at)
+
+    def get_updated_at(self):
+        """
+        Returns when the document was last updated as a datetime.
+        """
+        value = self.__dict__.get('updated_at')
+        if not isinstance(value, datetime.datetime):
+            value = self.__dict__['updated_at'] = parse_timestamp(value)
+        return value
+
+    def set_updated_at(self, value):
+        self.__dict__['updated_at'] = value
+    updated_at = property(get_updated_at, set_updated_at)
+
+    def get_resources(self):
+        """
+        Returns the document's hyperlinks as a Resource.
+        """
+        value = self.__dict__.get('resources')
+        if not isinstance(value, Resource):
+            value = self.__dict__['resources'] = Resource(value or {})
+        return value
+
+    def set_resources(self, value):
+        self.__dict__['resources'] = value
+    resources = property(get_resources, set_resources)
+
+    def get_mentions(self):
+        """
+        Returns where a search query was found in the document as a list
+        of Mentions, or None if there aren't any.
+        """
+        value = self.__dict__.get('mentions')
+        if value and not isinstance(value[0], Mention):
+            value = self.__dict__['mentions'] = [Mention(i) for i in value]
+        return value or None
+
+    def set_mentions(self, value):
+        self.__dict__['mentions'] = value
+    mentions = property(get_mentions, set_mentions)
 
     #
     # Updates and such
@@ -664,18 +1424,55 @@ class Document(BaseAPIObject):
             * published_url
             * data key/value pairs
 
+        Only the fields that have changed since the document was retrieved
+        are sent. If none have, nothing is sent at all. Inside a batch, the
+        changes are sent when the batch is.
+
         Returns nothing.
         """
-        params = dict(
-            title=self.title or '',
-            source=self.source or '',
-            description=self.description or '',
-            related_article=self.resources.related_article or '',
-            published_url=self.resources.published_url or '',
-            access=self.access,
-            data=self.data,
-        )
-        self._connection.put('documents/%s.json' % self.id, params)
+        if self._connection._queue_write(self):
+            return
+        params = self.get_changes()
+        if not params:
+            self._connection._skip_write()
+            return
+        self._write(params)
+
+    def _write(self, params):
+        self._connection.put('documents/%s.json' % self.id, dict(params))
+        self._mark_saved()
+
+    def _mark_saved(self):
+        """
+        Forget the changes that have been made, since DocumentCloud has
+        them now.
+        """
+        self.__dict__.pop('_saved', None)
+        resources = self.__dict__.get('resources')
+        if isinstance(resources, Resource):
+            resources.__dict__.pop('_saved', None)
+        data = self.__dict__.get('data')
+        if isinstance(data, DocumentDataDict):
+            self.__dict__['_saved'] = {'data': dict(data)}
+
+    def get_changes(self):
+        """
+        Returns the editable fields that have been changed since the
+        document was retrieved, along with the values `put` would send.
+        """
+        params = {}
+        for field in self._get_changed_fields():
+            if field == 'data':
+                params[field] = self.data
+            elif field == 'access':
+                params[field] = self.access
+            else:
+                params[field] = self.__dict__.get(field) or ''
+        resources = self.__dict__.get('resources')
+        if isinstance(resources, Resource):
+            for field in resources._get_changed_fields():
+                params[field] = getattr(resources, field) or ''
+        return params
 
     def save(self):
         """
@@ -687,6 +1484,10 @@ class Document(BaseAPIObject):
         """
         Deletes this object from documentcloud.org.
         """
+        if not self._connection._queue_write(self, delete=True):
+            self._delete()
+
+    def _delete(self):
         self._connection.documents.delete(self.id)
 
     #
@@ -700,14 +1501,35 @@ class Document(BaseAPIObject):
         This can happen when you retrieve documents via search, because
         the JSON response does not include complete meta data for all
         results.
+
+        If the document came back from a search with hydrate=True, the
+        rest of its search results are filled in at the same time.
         """
-        obj = self._connection.documents.get(id=self.id)
-        self.__dict__['contributor'] = obj.contributor
-        self.__dict__['contributor_organization'] = \
-            obj.contributor_organization
-        self.__dict__['data'] = obj.data
-        self.__dict__['annotations'] = obj.__dict__['annotations']
-        self.__dict__['sections'] = obj.__dict__['sections']
+        batch = self.__dict__.pop('_batch', None)
+        if batch is not None:
+            self._connection.documents.hydrate(batch)
+            if self.is_hydrated():
+                return
+        d = self._connection.documents.fetch(
+            'documents/%s.json' % self.id
+        ).get("document")
+        self._hydrate(d)
+
+    def is_hydrated(self, fields=None):
+        """
+        Returns whether the lazy loaded fields are already on hand.
+        """
+        return all(f in self.__dict__ for f in fields or self.LAZY_FIELDS)
+
+    def _hydrate(self, d):
+        """
+        Fill in the lazy loaded fields that are missing from the document's
+        full JSON, leaving any that have already been set alone.
+        """
+        for field in self.LAZY_FIELDS:
+            if field in d:
+                self.__dict__.setdefault(field, d[field])
+        self.__dict__.pop('_batch', None)
 
     def get_contributor(self):
         """
@@ -744,12 +1566,20 @@ class Document(BaseAPIObject):
     def get_data(self):
         """
         Fetch the data field if it does not exist.
+
+        The same DocumentDataDict is handed back every time, so changes
+        made to it are kept and sent along by `put`.
         """
         try:
-            return DocumentDataDict(self.__dict__['data'])
+            value = self.__dict__['data']
         except KeyError:
             self._lazy_load()
-            return DocumentDataDict(self.__dict__['data'])
+            value = self.__dict__['data']
+        if not isinstance(value, DocumentDataDict):
+            # Keep the original to tell whether it has been changed
+            self.__dict__.setdefault('_saved', {}).setdefault('data', value)
+            value = self.__dict__['data'] = DocumentDataDict(value or {})
+        return value
     data = property(get_data, set_data)
 
     def get_annotations(self):
@@ -757,26 +1587,36 @@ class Document(BaseAPIObject):
         Fetch the annotations field if it does not exist.
         """
         try:
-            obj_list = self.__dict__['annotations']
-            return [Annotation(i) for i in obj_list]
+            value = self.__dict__['annotations']
         except KeyError:
             self._lazy_load()
-            obj_list = self.__dict__['annotations']
-            return [Annotation(i) for i in obj_list]
-    annotations = property(get_annotations)
+            value = self.__dict__['annotations']
+        if value and not isinstance(value[0], Annotation):
+            value = self.__dict__['annotations'] = [
+                Annotation(i) for i in value
+            ]
+        return value
+
+    def set_annotations(self, value):
+        self.__dict__['annotations'] = value
+    annotations = property(get_annotations, set_annotations)
 
     def get_sections(self):
         """
         Fetch the sections field if it does not exist.
         """
         try:
-            obj_list = self.__dict__['sections']
-            return [Section(i) for i in obj_list]
+            value = self.__dict__['sections']
         except KeyError:
             self._lazy_load()
-            obj_list = self.__dict__['sections']
-            return [Section(i) for i in obj_list]
-    sections = property(get_sections)
+            value = self.__dict__['sections']
+        if value and not isinstance(value[0], Section):
+            value = self.__dict__['sections'] = [Section(i) for i in value]
+        return value
+
+    def set_sections(self, value):
+        self.__dict__['sections'] = value
+    sections = property(get_sections, set_sections)
 
     def get_entities(self):
         """
@@ -804,17 +1644,62 @@ class Document(BaseAPIObject):
 
     def _get_url(self, url):
         if self.access == 'public':
-            req = urllib.request.Request(
-                url,
-                headers={'User-Agent': "python-documentcloud"}
-            )
-            return urllib.request.urlopen(req).read()
+            return self._connection.download(url)
         else:
             raise NotImplementedError(
                 "Currently, DocumentCloud only allows you to access this \
 resource on public documents."
             )
 
+    def _download_url(self, url, path_or_file, resume=True,
+                      chunk_size=64 * 1024):
+        if self.access != 'public':
+            raise NotImplementedError(
+                "Currently, DocumentCloud only allows you to access this \
+resource on public documents."
+            )
+        if hasattr(path_or_file, 'write'):
+            return self._connection.download_to(
+                url,
+                path_or_file,
+                chunk_size=chunk_size
+            )
+        # While the download is unfinished, the version of the asset it's
+        # of is kept alongside it
+        info_path = '%s.partial' % path_or_file
+        offset = 0
+        validator = None
+        if resume and os.path.exists(path_or_file):
+            try:
+                with open(info_path) as f:
+                    info = json.load(f)
+                if info.get('url') == url:
+                    validator = info.get('validator')
+            except (IOError, ValueError):
+                pass
+            # Anything else at the path isn't known to be a piece of this
+            # asset, so it's replaced rather than added to
+            if validator:
+                offset = os.path.getsize(path_or_file)
+
+        def _save_validator(value):
+            with open(info_path, 'w') as f:
+                json.dump({'url': url, 'validator': value}, f)
+
+        with open(path_or_file, 'r+b' if offset else 'wb') as f:
+            f.seek(offset)
+            count = self._connection.download_to(
+                url,
+                f,
+                offset=offset,
+                chunk_size=chunk_size,
+                validator=validator,
+                on_validator=_save_validator
+            )
+        if os.path.exists(info_path):
+            os.remove(info_path)
+        return count
+
     def get_full_text_url(self):
         """
         Returns the URL that contains the full text of the document.
@@ -829,6 +1714,21 @@ resource on public documents."
         return self._get_url(self.full_text_url)
     full_text = property(get_full_text)
 
+    def download_full_text(self, path_or_file, resume=True,
+                           chunk_size=64 * 1024):
+        """
+        Streams the full text of the document into a file, a chunk at a
+        time, without holding it all in memory.
+
+        Accepts the same arguments as `download_pdf`.
+        """
+        return self._download_url(
+            self.full_text_url,
+            path_or_file,
+            resume=resume,
+            chunk_size=chunk_size
+        )
+
     def get_page_text_url(self, page):
         """
         Returns the URL for the full text of a particular page in the document.
@@ -863,6 +1763,29 @@ resource on public documents."
         return self._get_url(self.pdf_url)
     pdf = property(get_pdf)
 
+    def download_pdf(self, path_or_file, resume=True, chunk_size=64 * 1024):
+        """
+        Streams the full PDF of the document into a file, a chunk at a
+        time, without holding it all in memory.
+
+        Accepts a path or an open file object. If the path is a partial
+        download started by an earlier call, by default only the rest of it
+        is fetched, unless the PDF has changed since it was started. Any
+        other file at the path is overwritten.
+
+        Returns the number of bytes downloaded.
+
+        Example usage:
+
+            >> obj.download_pdf('/home/ben/report.pdf')
+        """
+        return self._download_url(
+            self.pdf_url,
+            path_or_file,
+            resume=resume,
+            chunk_size=chunk_size
+        )
+
     def get_small_image_url(self, page=1):
         """
         Returns the URL for the small sized image of a single page.
@@ -982,6 +1905,31 @@ resource on public documents."
         return self._get_url(url)
     large_image = property(get_large_image)
 
+    def download_pages(self, kind='text', pages=None, workers=8, dest=None):
+        """
+        Downloads the text or images of many pages at once.
+
+        The kind is 'text', or one of the image sizes: 'small', 'thumbnail',
+        'normal' or 'large'. Provide a list of page numbers to only get
+        some of them. They're fetched by a pool of workers.
+
+        Returns a PageDownload. Iterating over it yields each page number
+        with its contents, in page order, as they arrive. If you provide a
+        dest directory, the pages are all saved into it before this returns
+        and iterating yields the path of each file instead.
+
+        Example usage:
+
+            >> for page, text in obj.download_pages('text', workers=16):
+            >>     print(page, len(text))
+            >> download = obj.download_pages('large', dest='/home/ben/images')
+            >> download.stats()
+        """
+        download = PageDownload(self, kind, pages=pages, workers=workers, dest=dest)
+        if dest:
+            download.run()
+        return download
+
     #
     # Etc.
     #
@@ -1022,18 +1970,313 @@ class DocumentSet(list):
     Allows some tweaks, like preventing duplicate documents
     from getting into the list and ensuring that only Document
     objects are appended.
+
+    The documents are indexed by id, so checking whether one is in the
+    list, or pulling it out with `get`, doesn't require a search.
     """
-    def append(self, obj):
-        # Verify that the user is trying to add a Document object
-        if not isinstance(obj, Document):
-            raise TypeError("Only Document objects can be added to the \
+    def __init__(self, iterable=()):
+        super(DocumentSet, self).__init__()
+        self._index = {}
+        obj_list = list(iterable)
+        self._add_to_index(obj_list)
+        super(DocumentSet, self).extend(obj_list)
+
+    def __reduce__(self):
+        # Rebuild copies through the constructor so they get their own index
+        return (self.__class__, (list(self),))
+
+    def _add_to_index(self, obj_list):
+        """
+        Checks that a batch of documents can be added, then indexes them.
+        Nothing is indexed if any of them can't be.
+        """
+        new_index = {}
+        for obj in obj_list:
+            # Verify that the user is trying to add a Document object
+            if not isinstance(obj, Document):
+                raise TypeError("Only Document objects can be added to the \
 document_list")
-        # Check if the object is already in the list
-        if obj.id in [i.id for i in list(self.__iter__())]:
-            raise DuplicateObjectError("This object already exists in \
+            # Check if the object is already in the list
+            key = str(obj.id)
+            if key in self._index or key in new_index:
+                raise DuplicateObjectError("This object already exists in \
 the document_list")
-        # If it's all true, append it.
-        super(DocumentSet, self).append(copy.copy(obj))
+            new_index[key] = obj
+        self._index.update(new_index)
+
+    def _remove_from_index(self, obj_list):
+        for obj in obj_list:
+            del self._index[str(obj.id)]
+
+    def __contains__(self, obj):
+        """
+        Tests whether a Document, or a document id, is in the list.
+        """
+        return str(getattr(obj, 'id', obj)) in self._index
+
+    def get(self, id, default=None):
+        """
+        Returns the document with the provided id, or the default if it
+        isn't in the list.
+        """
+        return self._index.get(str(id), default)
+
+    def append(self, obj):
+        obj = copy.copy(obj)
+        self._add_to_index([obj])
+        super(DocumentSet, self).append(obj)
+
+    def extend(self, iterable):
+        obj_list = [copy.copy(obj) for obj in iterable]
+        self._add_to_index(obj_list)
+        super(DocumentSet, self).extend(obj_list)
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    def insert(self, i, obj):
+        obj = copy.copy(obj)
+        self._add_to_index([obj])
+        super(DocumentSet, self).insert(i, obj)
+
+    def remove(self, obj):
+        """
+        Removes a Document, or the document with an id, from the list.
+        """
+        key = str(getattr(obj, 'id', obj))
+        if key not in self._index:
+            raise ValueError("%s is not in the document_list" % key)
+        super(DocumentSet, self).remove(self._index.pop(key))
+
+    def pop(self, i=-1):
+        obj = super(DocumentSet, self).pop(i)
+        self._remove_from_index([obj])
+        return obj
+
+    def clear(self):
+        del self[:]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return DocumentSet(super(DocumentSet, self).__getitem__(i))
+        return super(DocumentSet, self).__getitem__(i)
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            obj_list = [copy.copy(obj) for obj in value]
+            old_list = super(DocumentSet, self).__getitem__(i)
+        else:
+            obj_list = [copy.copy(value)]
+            old_list = [super(DocumentSet, self).__getitem__(i)]
+        # The documents being replaced can be replaced by themselves
+        self._remove_from_index(old_list)
+        try:
+            self._add_to_index(obj_list)
+        except Exception:
+            self._add_to_index(old_list)
+            raise
+        try:
+            if isinstance(i, slice):
+                super(DocumentSet, self).__setitem__(i, obj_list)
+            else:
+                super(DocumentSet, self).__setitem__(i, obj_list[0])
+        except Exception:
+            self._remove_from_index(obj_list)
+            self._add_to_index(old_list)
+            raise
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            old_list = super(DocumentSet, self).__getitem__(i)
+        else:
+            old_list = [super(DocumentSet, self).__getitem__(i)]
+        super(DocumentSet, self).__delitem__(i)
+        self._remove_from_index(old_list)
+
+    # Python 2 slices lists without going through the methods above
+    if six.PY2:
+        def __getslice__(self, i, j):
+            return self.__getitem__(slice(i, j))
+
+        def __setslice__(self, i, j, value):
+            return self.__setitem__(slice(i, j), value)
+
+        def __delslice__(self, i, j):
+            return self.__delitem__(slice(i, j))
+
+
+class PageDownload(object):
+    """
+    The download of many pages of a Document, with a tally of how fast
+    it went.
+    """
+    # The method that gives the URL for each kind of page
+    KINDS = {
+        'text': 'get_page_text_url',
+        'small': 'get_small_image_url',
+        'thumbnail': 'get_thumbnail_image_url',
+        'normal': 'get_normal_image_url',
+        'large': 'get_large_image_url',
+    }
+
+    def __init__(self, document, kind='text', pages=None, workers=8,
+                 dest=None):
+        if kind not in self.KINDS:
+            raise ValueError("The kind of page must be one of: %s" % (
+                ", ".join(sorted(self.KINDS))
+            ))
+        self.document = document
+        self.kind = kind
+        if pages is None:
+            pages = range(1, document.pages + 1)
+        self.pages = list(pages)
+        self.workers = workers
+        self.dest = dest
+        self.paths = None
+        self.count = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return '<%s: %s of %s pages>' % (
+            self.__class__.__name__,
+            self.count,
+            len(self.pages)
+        )
+
+    def stats(self):
+        """
+        Returns a dictionary of how many pages have been downloaded and how
+        fast.
+        """
+        seconds = self.seconds
+        return {
+            'pages': self.count,
+            'bytes': self.bytes,
+            'seconds': seconds,
+            'pages_per_second': self.count / seconds if seconds else 0.0,
+            'bytes_per_second': self.bytes / seconds if seconds else 0.0,
+        }
+
+    def _fetch(self, page):
+        """
+        Downloads a single page, saving it if there's somewhere to.
+        """
+        url = getattr(self.document, self.KINDS[self.kind])(page)
+        content = self.document._get_url(url)
+        if not self.dest:
+            return page, content, len(content)
+        name = os.path.basename(urllib.parse.urlsplit(url).path)
+        path = os.path.join(self.dest, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return page, path, len(content)
+
+    def __iter__(self):
+        if self.paths is not None:
+            for item in zip(self.pages, self.paths):
+                yield item
+            return
+        # Each time through downloads them all again, so count afresh
+        self.count = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        start = time.time()
+        # Only run a few pages ahead of the loop, so the ones waiting to be
+        # used don't pile up in memory
+        size = self.workers * 4
+        for i in range(0, len(self.pages), size):
+            result_list = bounded_map(
+                self._fetch,
+                self.pages[i:i + size],
+                self.workers
+            )
+            for page, value, length in result_list:
+                self.count += 1
+                self.bytes += length
+                self.seconds = time.time() - start
+                yield page, value
+
+    def run(self):
+        """
+        Downloads all of the pages into the dest directory. Returns the path
+        of each file, in page order.
+        """
+        if not os.path.exists(self.dest):
+            os.makedirs(self.dest)
+        self.paths = [path for page, path in self]
+        return self.paths
+
+
+class LazyDocumentList(object):
+    """
+    A read-only list of documents that are only fetched once they're used.
+
+    Indexing fetches a single document. Iterating fetches them a few at a
+    time, `workers` at once, just ahead of where the loop is. Checking
+    whether a document id is in the list doesn't fetch anything.
+    """
+    def __init__(self, connection, document_ids, workers=8):
+        self._connection = connection
+        self.document_ids = [str(i) for i in document_ids]
+        self.workers = workers
+        self._index = dict((id, i) for i, id in enumerate(self.document_ids))
+        self._cache = [None] * len(self.document_ids)
+
+    def __repr__(self):
+        return '<%s: %s documents>' % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(self.document_ids)
+
+    def __contains__(self, obj):
+        return str(getattr(obj, 'id', obj)) in self._index
+
+    def _fetch(self, i_list):
+        """
+        Fetches the documents at a list of positions that haven't been.
+        """
+        i_list = [i for i in i_list if self._cache[i] is None]
+        obj_list = bounded_map(
+            lambda i: self._connection.documents.get(self.document_ids[i]),
+            i_list,
+            workers=self.workers
+        )
+        for i, obj in zip(i_list, obj_list):
+            self._cache[i] = obj
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            i_list = list(range(*i.indices(len(self))))
+            self._fetch(i_list)
+            return [self._cache[j] for j in i_list]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document_list index out of range")
+        if self._cache[i] is None:
+            self._cache[i] = self._connection.documents.get(
+                self.document_ids[i]
+            )
+        return self._cache[i]
+
+    def __iter__(self):
+        for start in range(0, len(self), self.workers):
+            i_list = range(start, min(start + self.workers, len(self)))
+            self._fetch(i_list)
+            for i in i_list:
+                yield self._cache[i]
+
+    def get(self, id, default=None):
+        """
+        Returns the document with the provided id, or the default if it
+        isn't in the list.
+        """
+        try:
+            return self[self._index[str(id)]]
+        except KeyError:
+            return default
 
 
 class Entity(BaseAPIObject):
@@ -1082,6 +2325,8 @@ class Project(BaseAPIObject):
     """
     A project returned by the API.
     """
+    EDITABLE_FIELDS = ('title', 'description')
+
     def __setattr__(self, attr, value):
         """
         An override that allows for a custom method setting 'document_list'
@@ -1095,7 +2340,7 @@ class Project(BaseAPIObject):
             else:
                 raise TypeError
         else:
-            object.__setattr__(self, attr, value)
+            super(Project, self).__setattr__(attr, value)
 
     #
     # Updates and such
@@ -1112,14 +2357,55 @@ class Project(BaseAPIObject):
             * description
             * document_ids
 
+        Only the fields that have changed since the project was retrieved
+        are sent. If none have, nothing is sent at all. Inside a batch, the
+        changes are sent when the batch is.
+
         Returns nothing.
         """
+        if self._connection._queue_write(self):
+            return
+        params = self.get_changes()
+        if not params:
+            self._connection._skip_write()
+            return
+        self._write(params)
+
+    def _write(self, params):
+        self._connection.put('projects/%s.json' % self.id, dict(params))
+        self._mark_saved()
+        self._connection.projects.invalidate()
+
+    def _mark_saved(self):
+        """
+        Forget the changes that have been made, since DocumentCloud has
+        them now.
+        """
+        self.__dict__.pop('_saved', None)
+        if 'document_list' in self.__dict__:
+            self.__dict__['document_ids'] = [
+                str(i.id) for i in self.document_list
+            ]
+
+    def get_changes(self):
+        """
+        Returns the editable fields that have been changed since the
+        project was retrieved, along with the values `put` would send.
+        """
         params = dict(
-            title=self.title or '',
-            description=self.description or '',
-            document_ids=[str(i.id) for i in self.document_list]
+            (field, self.__dict__.get(field) or '')
+            for field in self._get_changed_fields()
         )
-        self._connection.put('projects/%s.json' % self.id, params)
+        # The document list can only have changed if it has been loaded
+        if 'document_list' in self.__dict__:
+            document_ids = [str(i.id) for i in self.document_list]
+            saved_ids = self.__dict__.get('document_ids') or []
+            # Ids may come with or without their slugs, so only the numbers
+            # are compared
+            if [str(i).split('-')[0] for i in document_ids] != \
+                    [str(i).split('-')[0] for i in saved_ids]:
+                params['document_ids'] = document_ids
+        return params
 
     def save(self):
         """
@@ -1131,22 +2417,48 @@ class Project(BaseAPIObject):
         """
         Deletes this object from documentcloud.org.
         """
+        if not self._connection._queue_write(self, delete=True):
+            self._delete()
+
+    def _delete(self):
         self._connection.projects.delete(self.id)
 
     #
     # Documents
     #
 
-    def get_document_list(self):
+    def get_document_list(self, workers=8, lazy=False):
         """
         Retrieves all documents included in this project.
+
+        The documents are fetched by a pool of workers and kept in the same
+        order as the project's document_ids.
+
+        Set lazy to True to get back a LazyDocumentList, which only fetches
+        the documents as they are used. It doesn't replace the project's
+        document_list, so it can't be edited.
+
+        Example usage:
+
+            >> obj = documentcloud.projects.get_by_id('703')
+            >> obj_list = obj.get_document_list(workers=16)
+            >> for doc in obj.get_document_list(lazy=True):
+            >>     print(doc.title)
         """
         try:
             return self.__dict__['document_list']
         except KeyError:
-            obj_list = DocumentSet([
-                self._connection.documents.get(i) for i in self.document_ids
-            ])
+            if lazy:
+                return LazyDocumentList(
+                    self._connection,
+                    self.document_ids,
+                    workers=workers
+                )
+            obj_list = DocumentSet(bounded_map(
+                self._connection.documents.get,
+                self.document_ids,
+                workers=workers
+            ))
             self.__dict__['document_list'] = obj_list
             return obj_list
     document_list = property(get_document_list)
@@ -1155,18 +2467,19 @@ class Project(BaseAPIObject):
         """
         Retrieves a particular document from this project.
         """
-        obj_list = self.document_list
-        matches = [i for i in obj_list if str(i.id) == str(id)]
-        if not matches:
+        obj = self.document_list.get(id)
+        if obj is None:
             raise DoesNotExistError("The resource you've requested does not \
 exist or is unavailable without the proper credentials.")
-        return matches[0]
+        return obj
 
 
 class Resource(BaseAPIObject):
     """
     The resources associated with a Document. Hyperlinks and such.
     """
+    EDITABLE_FIELDS = ('related_article', 'published_url')
+
     def __repr__(self):
         return '<%ss>' % self.__class__.__name__
 
@@ -0,0 +1,263 @@
+"""
+An asyncio interface to the DocumentCloud API. Python 3 only.
+
+Mirrors DocumentCloud, DocumentClient and ProjectClient with awaitable
+methods that return the same Document, Project and Annotation objects.
+Requests are run on a bounded pool of worker threads sharing one keep-alive
+ConnectionPool, so a single event loop can keep many of them in flight.
+Each request holds a thread until it's answered, so no more than
+`max_workers` of them are ever in flight at once. The rest wait their turn,
+however many are gathered.
+
+Example usage:
+
+    >> async with AsyncDocumentCloud(max_workers=100) as client:
+    >>     docs = await asyncio.gather(*[
+    >>         client.documents.get(i) for i in id_list
+    >>     ])
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from . import DocumentCloud
+from .transport import ConnectionPool
+
+
+class AsyncDocumentCloud(object):
+    """
+    The public asyncio interface for the DocumentCloud API
+    """
+    def __init__(
+        self, username=None, password=None, base_uri=None, transport=None,
+        max_workers=32, **kwargs
+    ):
+        self.max_workers = max_workers
+        self.client = DocumentCloud(
+            username,
+            password,
+            base_uri,
+            transport=transport or ConnectionPool(maxsize=max_workers),
+            **kwargs
+        )
+        self.transport = self.client.transport
+        self._executor = ThreadPoolExecutor(max_workers)
+        self.documents = AsyncDocumentClient(self, self.client.documents)
+        self.projects = AsyncProjectClient(self, self.client.projects)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Shuts down the worker threads and closes idle connections.
+        """
+        self._executor.shutdown(wait=False)
+        self.transport.clear()
+
+    def run(self, func, *args, **kwargs):
+        """
+        Runs a blocking call on the worker pool and returns an awaitable.
+        It has to be called from a coroutine.
+        """
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            self._executor,
+            functools.partial(func, *args, **kwargs)
+        )
+
+    async def fetch(self, method, params=None):
+        """
+        Fetch an url.
+        """
+        return await self.run(self.client.fetch, method, params)
+
+    async def put(self, method, params):
+        """
+        Post changes back to DocumentCloud
+        """
+        return await self.run(self.client.put, method, params)
+
+
+class AsyncDocumentClient(object):
+    """
+    Awaitable methods for collecting documents
+    """
+    def __init__(self, connection, client):
+        self._connection = connection
+        self.client = client
+
+    async def search(self, query, page=None, per_page=1000, mentions=3,
+                     data=False):
+        """
+        Retrieve all objects that make a search query.
+        """
+        return await self._connection.run(
+            self.client.search,
+            query,
+            page=page,
+            per_page=per_page,
+            mentions=mentions,
+            data=data
+        )
+
+    async def get(self, id):
+        """
+        Retrieve a particular document using it's unique identifier.
+        """
+        return await self._connection.run(self.client.get, id)
+
+    async def upload(self, pdf, **kwargs):
+        """
+        Upload a PDF or other image file to DocumentCloud.
+
+        Accepts the same keyword arguments as DocumentClient.upload.
+        """
+        return await self._connection.run(self.client.upload, pdf, **kwargs)
+
+    async def delete(self, id):
+        """
+        Deletes a Document.
+        """
+        return await self._connection.run(self.client.delete, id)
+
+    async def put(self, document):
+        """
+        Save changes made to a Document to DocumentCloud.
+        """
+        return await self._connection.run(document.put)
+
+    async def bulk_update(self, changes, **kwargs):
+        """
+        Saves changes to many documents at once.
+
+        Accepts the same keyword arguments as DocumentClient.bulk_update.
+        """
+        return await self._connection.run(
+            self.client.bulk_update,
+            changes,
+            **kwargs
+        )
+
+    async def get_entities(self, document):
+        """
+        Fetch the entities extracted from a Document by OpenCalais.
+        """
+        return await self._connection.run(document.get_entities)
+
+    #
+    # Assets
+    #
+
+    async def get_pdf(self, document):
+        """
+        Downloads and returns the full PDF of a Document.
+        """
+        return await self._connection.run(document.get_pdf)
+
+    async def get_full_text(self, document):
+        """
+        Downloads and returns the full text of a Document.
+        """
+        return await self._connection.run(document.get_full_text)
+
+    async def get_page_text(self, document, page):
+        """
+        Downloads and returns the text of a particular page of a Document.
+        """
+        return await self._connection.run(document.get_page_text, page)
+
+    async def get_small_image(self, document, page=1):
+        """
+        Downloads and returns the small sized image of a single page.
+        """
+        return await self._connection.run(document.get_small_image, page)
+
+    async def get_thumbnail_image(self, document, page=1):
+        """
+        Downloads and returns the thumbnail sized image of a single page.
+        """
+        return await self._connection.run(document.get_thumbnail_image, page)
+
+    async def get_normal_image(self, document, page=1):
+        """
+        Downloads and returns the normal sized image of a single page.
+        """
+        return await self._connection.run(document.get_normal_image, page)
+
+    async def get_large_image(self, document, page=1):
+        """
+        Downloads and returns the large sized image of a single page.
+        """
+        return await self._connection.run(document.get_large_image, page)
+
+
+class AsyncProjectClient(object):
+    """
+    Awaitable methods for collecting projects
+    """
+    def __init__(self, connection, client):
+        self._connection = connection
+        self.client = client
+
+    async def all(self):
+        """
+        Retrieve all your projects. Requires authentication.
+        """
+        return await self._connection.run(self.client.all)
+
+    async def get(self, id=None, title=None):
+        """
+        Retrieve a particular project using its unique identifier or
+        it's title.
+        """
+        return await self._connection.run(self.client.get, id=id, title=title)
+
+    async def get_by_id(self, id):
+        return await self.get(id=id)
+
+    async def get_by_title(self, title):
+        return await self.get(title=title)
+
+    async def create(self, title, description=None, document_ids=None):
+        """
+        Creates a new project.
+        """
+        return await self._connection.run(
+            self.client.create,
+            title,
+            description=description,
+            document_ids=document_ids
+        )
+
+    async def get_or_create_by_title(self, title):
+        """
+        Fetch a title, if it exists. Create it if it doesn't.
+        """
+        return await self._connection.run(
+            self.client.get_or_create_by_title,
+            title
+        )
+
+    async def delete(self, id):
+        """
+        Deletes a Project.
+        """
+        return await self._connection.run(self.client.delete, id)
+
+    async def put(self, project):
+        """
+        Save changes made to a Project to DocumentCloud.
+        """
+        return await self._connection.run(project.put)
+
+    async def get_document_list(self, project, workers=8):
+        """
+        Retrieves all documents included in a Project.
+        """
+        return await self._connection.run(
+            project.get_document_list,
+            workers=workers
+        )
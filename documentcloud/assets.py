@@ -0,0 +1,227 @@
+"""
+A local store of downloaded assets, like a document's PDF, text and page
+images, so opening the same ones again doesn't go back to the network.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+
+class AssetStore(object):
+    """
+    A size-capped directory of downloaded assets.
+
+    Each file is saved once under the hash of its contents, however many
+    URLs it was downloaded from, and a SQLite index maps the URLs to
+    the hashes. Files are written to a temporary name and renamed into
+    place, and the index is only changed inside transactions, so several
+    processes can share the same store. The index keeps a running total of
+    the store's size, and once it grows past `max_size` bytes the least
+    recently used assets are removed.
+
+    Assets are treated as immutable. Once a URL is in the store it's never
+    checked with the server again, so if a document is reprocessed, its
+    old images and text are returned until they're evicted or the store
+    is cleared.
+
+    Example usage:
+
+        >> store = AssetStore('/tmp/documentcloud-assets', max_size=10 * 1024 ** 3)
+        >> client = DocumentCloud(asset_store=store)
+    """
+    def __init__(self, path, max_size=1024 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(path, 'index.db'),
+            timeout=30,
+            check_same_thread=False
+        )
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    hash TEXT,
+                    last_used REAL
+                )
+            """)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER
+                )
+            """)
+            # A single row with the total size of the blobs
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS total (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    size INTEGER
+                )
+            """)
+            self._db.execute("""
+                INSERT OR IGNORE INTO total
+                SELECT 0, COALESCE(SUM(size), 0) FROM blobs
+            """)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Returns a dictionary of how often the store has saved a download.
+        """
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            size = self._get_size()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'count': count,
+                'size': size,
+            }
+
+    def _get_size(self):
+        return self._db.execute("SELECT size FROM total").fetchone()[0]
+
+    def _get_blob_path(self, hash):
+        return os.path.join(self.path, hash[:2], hash)
+
+    def get(self, url):
+        """
+        Returns the contents saved for a url, or None if there aren't any.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hash FROM urls WHERE url = ?",
+                (url,)
+            ).fetchone()
+        content = None
+        if row:
+            try:
+                with open(self._get_blob_path(row[0]), 'rb') as f:
+                    content = f.read()
+            except (IOError, OSError):
+                # Evicted by another process
+                pass
+            # Make sure it's all there
+            if content is not None and \
+                    hashlib.sha1(content).hexdigest() != row[0]:
+                content = None
+        with self._lock:
+            if content is None:
+                self.misses += 1
+                if row:
+                    with self._db:
+                        self._db.execute(
+                            "DELETE FROM urls WHERE url = ?",
+                            (url,)
+                        )
+            else:
+                self.hits += 1
+                with self._db:
+                    self._db.execute(
+                        "UPDATE urls SET last_used = ? WHERE url = ?",
+                        (time.time(), url)
+                    )
+        return content
+
+    def set(self, url, content):
+        """
+        Saves the contents downloaded from a url.
+        """
+        if len(content) > self.max_size:
+            return
+        hash = hashlib.sha1(content).hexdigest()
+        path = self._get_blob_path(hash)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            if not os.path.exists(directory):
+                try:
+                    os.makedirs(directory)
+                except OSError:
+                    # Made by another process
+                    pass
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.rename(tmp_path, path)
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO urls VALUES (?, ?, ?)",
+                    (url, hash, time.time())
+                )
+                added = self._db.execute(
+                    "INSERT OR IGNORE INTO blobs VALUES (?, ?)",
+                    (hash, len(content))
+                ).rowcount
+                if added:
+                    self._db.execute(
+                        "UPDATE total SET size = size + ?",
+                        (len(content),)
+                    )
+                size = self._get_size()
+        if size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used assets until the store is back under
+        90% of its maximum size, leaving room to grow before the next sweep.
+        """
+        target = self.max_size * 0.9
+        with self._lock:
+            with self._db:
+                size = self._get_size()
+                if size <= target:
+                    return
+                # The assets by when any of their urls were last used
+                row_list = self._db.execute("""
+                    SELECT blobs.hash, blobs.size
+                    FROM blobs LEFT JOIN urls ON urls.hash = blobs.hash
+                    GROUP BY blobs.hash
+                    ORDER BY MAX(urls.last_used)
+                """).fetchall()
+                for hash, blob_size in row_list:
+                    if size <= target:
+                        break
+                    self._db.execute("DELETE FROM urls WHERE hash = ?", (hash,))
+                    self._db.execute("DELETE FROM blobs WHERE hash = ?", (hash,))
+                    self._db.execute(
+                        "UPDATE total SET size = size - ?",
+                        (blob_size,)
+                    )
+                    try:
+                        os.remove(self._get_blob_path(hash))
+                    except OSError:
+                        pass
+                    size -= blob_size
+                    self.evictions += 1
+
+    def clear(self):
+        """
+        Removes everything from the store.
+        """
+        with self._lock:
+            with self._db:
+                hash_list = self._db.execute(
+                    "SELECT hash FROM blobs"
+                ).fetchall()
+                self._db.execute("DELETE FROM urls")
+                self._db.execute("DELETE FROM blobs")
+                self._db.execute("UPDATE total SET size = 0")
+            for (hash,) in hash_list:
+                try:
+                    os.remove(self._get_blob_path(hash))
+                except OSError:
+                    pass
+
+    def close(self):
+        self._db.close()
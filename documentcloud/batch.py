@@ -0,0 +1,138 @@
+"""
+Write-behind batching of saves and deletes.
+
+Inside a batch, saving or deleting a Document or Project only queues the
+request. Repeated saves of the same object collapse into one, and the queue
+is sent with a pool of workers when the batch ends or grows too big.
+"""
+import time
+import threading
+from .toolbox import bounded_map
+from .toolbox import BulkResult
+from .toolbox import BatchFailedError
+
+
+class WriteBatch(object):
+    """
+    A queue of saves and deletes waiting to be sent to DocumentCloud.
+
+    Writes are kept per object. Saving an object again replaces the queued
+    save, and saves of different copies of the same object are combined,
+    with the later values winning and their data dictionaries merged.
+    Deleting an object drops any save waiting for it.
+
+    The queue is flushed once it holds `max_size` objects and again when the
+    batch ends. Each flush sends its writes with `workers` threads. If any
+    of them fail, a BatchFailedError is raised at the end of the batch.
+
+    If the block raises an exception, whatever is still queued is thrown
+    away rather than sent, so half-finished edits aren't saved. Writes
+    already flushed because the queue was full have gone out.
+
+    Example usage:
+
+        >> with documentcloud.batch(workers=8) as batch:
+        >>     for obj in documentcloud.documents.search('salazar'):
+        >>         obj.data['topic'] = 'interior'
+        >>         obj.save()
+        >> batch.result.stats()
+    """
+    def __init__(self, connection, workers=4, max_size=100):
+        self._connection = connection
+        self.workers = workers
+        self.max_size = max_size
+        self.result = BulkResult()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def __enter__(self):
+        self._previous = self._connection._write_batch
+        self._connection._write_batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._connection._write_batch = self._previous
+        if exc_type is not None:
+            with self._lock:
+                self._pending = {}
+            return
+        self.flush()
+        if self.result.errors:
+            raise BatchFailedError(
+                "%s of %s writes failed" % (
+                    len(self.result.errors),
+                    len(self.result)
+                ),
+                result=self.result
+            )
+
+    def add(self, obj, delete=False):
+        """
+        Queues a save, or a delete, of an object.
+        """
+        key = (obj.__class__.__name__, str(obj.id))
+        with self._lock:
+            obj_list, deleted = self._pending.get(key, ([], False))
+            if delete:
+                self._pending[key] = ([obj], True)
+            elif not deleted:
+                if not any(i is obj for i in obj_list):
+                    obj_list.append(obj)
+                self._pending[key] = (obj_list, False)
+            full = len(self._pending) >= self.max_size
+        if full:
+            self.flush()
+
+    def _write(self, item):
+        """
+        Sends the queued write for one object. Returns its id and outcome.
+        """
+        obj_list, delete = item
+        obj = obj_list[-1]
+        try:
+            if delete:
+                obj._delete()
+                return obj.id, True
+            # Combine the changes to each copy, oldest first
+            params = {}
+            for i in obj_list:
+                changes = i.get_changes()
+                if 'data' in changes and 'data' in params:
+                    data = params['data'].copy()
+                    data.update(changes['data'])
+                    changes['data'] = data
+                params.update(changes)
+            if not params:
+                self._connection._skip_write()
+                return obj.id, False
+            obj._write(params)
+            for i in obj_list:
+                i._mark_saved()
+        except Exception as e:
+            return obj.id, e
+        return obj.id, True
+
+    def flush(self):
+        """
+        Sends everything in the queue. Returns a BulkResult for this flush
+        and adds it to the running total in `result`.
+        """
+        with self._lock:
+            item_list = list(self._pending.values())
+            self._pending = {}
+        result = BulkResult()
+        start = time.time()
+        for id, outcome in bounded_map(self._write, item_list, self.workers):
+            result.add(id, outcome)
+        result.seconds = time.time() - start
+        with self._lock:
+            self.result.updated.extend(result.updated)
+            self.result.skipped.extend(result.skipped)
+            self.result.errors.update(result.errors)
+            self.result.seconds += result.seconds
+        return result
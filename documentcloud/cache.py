@@ -0,0 +1,204 @@
+"""
+An on-disk cache of HTTP responses, revalidated with their ETag and
+Last-Modified headers.
+
+When a cached copy exists the request is sent with If-None-Match and
+If-Modified-Since headers. If DocumentCloud answers 304 Not Modified, the
+copy on disk is used instead of downloading the whole thing again.
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+
+class CacheEntry(object):
+    """
+    A response saved in the cache.
+    """
+    def __init__(self, path, url, etag=None, last_modified=None):
+        self.path = path
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def get_conditional_headers(self):
+        """
+        Returns the headers that ask the server to only send the response
+        again if it has changed.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def read(self):
+        """
+        Returns the saved body of the response.
+        """
+        with open(self.path, 'rb') as f:
+            f.readline()
+            return f.read()
+
+
+class HTTPCache(object):
+    """
+    A size-capped directory of cached responses.
+
+    Each response is saved in its own file, with its validators on the
+    first line. Files are written to a temporary name and renamed into
+    place, so several processes can share the directory. Reading an entry
+    touches it, and once the directory grows past `max_size` bytes the
+    least recently used entries are removed.
+
+    Example usage:
+
+        >> cache = HTTPCache('/tmp/documentcloud', max_size=2 * 1024 ** 3)
+        >> client = DocumentCloud(cache=cache)
+    """
+    def __init__(self, path, max_size=512 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self._lock = threading.Lock()
+        self._size = sum(i[2] for i in self._list_entries())
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """
+        Returns a dictionary of how often the cache has saved a download.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': self._size,
+            }
+
+    def _get_path(self, url, vary=None):
+        # Responses that depend on the credentials used are kept separately
+        key = url if vary is None else '%s %s' % (vary, url)
+        return os.path.join(
+            self.path,
+            hashlib.sha1(key.encode('utf-8')).hexdigest()
+        )
+
+    def _list_entries(self):
+        """
+        Returns the path, last use and size of every entry in the cache.
+        """
+        entry_list = []
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name.startswith('.'):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another process
+                continue
+            entry_list.append((path, stat.st_mtime, stat.st_size))
+        return entry_list
+
+    def get(self, url, vary=None):
+        """
+        Returns the CacheEntry for a url, or None if it isn't cached.
+        """
+        path = self._get_path(url, vary)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return None
+        return CacheEntry(
+            path,
+            url,
+            etag=meta.get('etag'),
+            last_modified=meta.get('last_modified')
+        )
+
+    def hit(self, entry):
+        """
+        Records that an entry was used and returns its body.
+        """
+        try:
+            os.utime(entry.path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry.read()
+
+    def set(self, url, content, headers, vary=None):
+        """
+        Saves a response, if it came with headers that it can be
+        revalidated with.
+        """
+        with self._lock:
+            self.misses += 1
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        cache_control = headers.get('Cache-Control') or ''
+        if not (etag or last_modified) or 'no-store' in cache_control:
+            return
+        if len(content) > self.max_size:
+            return
+        meta = json.dumps({
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+        }).encode('utf-8')
+        path = self._get_path(url, vary)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(meta + b'\n')
+            f.write(content)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        os.rename(tmp_path, path)
+        with self._lock:
+            self._size += len(meta) + 1 + len(content) - old_size
+            if self._size <= self.max_size:
+                return
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is back under
+        90% of its maximum size, leaving room to grow before the next sweep.
+        """
+        with self._lock:
+            entry_list = sorted(self._list_entries(), key=lambda i: i[1])
+            size = sum(i[2] for i in entry_list)
+            target = self.max_size * 0.9
+            for path, mtime, entry_size in entry_list:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= entry_size
+                self.evictions += 1
+            self._size = size
+
+    def clear(self):
+        """
+        Removes everything from the cache.
+        """
+        with self._lock:
+            for path, mtime, size in self._list_entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
@@ -0,0 +1,603 @@
+"""
+An in-process stand-in for the DocumentCloud API.
+
+It answers the same endpoints the clients use, along with the asset URLs
+for each document's PDF, text and page images, from a corpus it makes up.
+Requests can be slowed down, or made to fail now and again, so the client
+can be tested and its speed measured without going over the network.
+
+It can be handed to a client as its transport, so no sockets are involved
+at all, or served over HTTP on localhost.
+
+Example usage:
+
+    >> fake = FakeDocumentCloud(corpus_size=5000, latency=0.02)
+    >> client = DocumentCloud(
+    >>  'user',
+    >>  'pass',
+    >>  base_uri=fake.base_uri,
+    >>  transport=fake.transport()
+    >>)
+    >> client.documents.search('salazar')
+
+    >> base_uri = fake.serve()
+    >> client = DocumentCloud(base_uri=base_uri)
+    >> fake.shutdown()
+"""
+import re
+import sys
+import six
+import json
+import time
+import random
+import socket
+import hashlib
+import threading
+from email.message import Message
+from six.moves import BaseHTTPServer, socketserver
+from .transport import Transport
+if six.PY3:
+    import urllib.error
+    import urllib.parse
+else:
+    from six.moves import urllib
+
+
+class FakeResponse(object):
+    """
+    A response from the fake, which looks like one read off the network.
+    """
+    def __init__(self, url, status, reason, headers, content):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._body = six.BytesIO(content)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def getcode(self):
+        return self.status
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def read(self, amt=None):
+        if amt is None:
+            return self._body.read()
+        return self._body.read(amt)
+
+    def readinto(self, b):
+        return self._body.readinto(b)
+
+    def close(self):
+        self._body.close()
+
+
+class FakeTransport(Transport):
+    """
+    Hands requests straight to a FakeDocumentCloud, without any sockets.
+    """
+    def __init__(self, fake):
+        self.fake = fake
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests}
+
+    def request(self, method, url, body=None, headers=None, idempotent=None):
+        with self._lock:
+            self.requests += 1
+        parts = urllib.parse.urlsplit(url)
+        if hasattr(body, 'read'):
+            body = body.read()
+        status, header_list, content = self.fake.handle(
+            method,
+            parts.path,
+            parts.query,
+            body or b'',
+            headers or {},
+            parts.netloc
+        )
+        message = Message()
+        for key, value in header_list:
+            message[key] = value
+        reason = FakeDocumentCloud.REASONS.get(status, '')
+        if status >= 400:
+            raise urllib.error.HTTPError(
+                url,
+                status,
+                reason,
+                message,
+                six.BytesIO(content)
+            )
+        return FakeResponse(url, status, reason, message, content)
+
+
+class _ThreadingServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up aren't worth reporting
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(
+                self,
+                request,
+                client_address
+            )
+
+
+class FakeDocumentCloud(object):
+    """
+    A made-up DocumentCloud with `corpus_size` public documents of `pages`
+    pages each, and no projects.
+
+    Every request waits `latency` seconds, and `error_rate` of them fail
+    with a 503, picked at random from a generator seeded with `seed`. Each
+    asset is `asset_size` bytes long. Saves, deletes, uploads and new
+    projects are all remembered.
+
+    Every request is noted in `log` as a (method, path, params) tuple, with
+    any uploaded file given as its SHA-1. Saves and uploads with a title in
+    `refused_titles` are turned away with a 422, and setting `ranges` to
+    False makes asset requests ignore their Range header.
+    """
+    REASONS = {
+        200: 'OK',
+        206: 'Partial Content',
+        304: 'Not Modified',
+        404: 'Not Found',
+        416: 'Requested Range Not Satisfiable',
+        422: 'Unprocessable Entity',
+        503: 'Service Unavailable',
+    }
+    EDITABLE_FIELDS = (
+        'title',
+        'source',
+        'description',
+        'access',
+        'related_article',
+        'published_url',
+    )
+    # The fields search results leave out
+    LAZY_FIELDS = (
+        'contributor',
+        'contributor_organization',
+        'data',
+        'annotations',
+        'sections',
+    )
+    SIZES = ('small', 'thumbnail', 'normal', 'large')
+
+    def __init__(self, corpus_size=1000, pages=10, latency=0.0,
+                 error_rate=0.0, asset_size=10 * 1024, seed=0,
+                 host='fake.documentcloud.test'):
+        self.pages = pages
+        self.latency = latency
+        self.error_rate = error_rate
+        self.asset_size = asset_size
+        self.base_uri = 'http://%s/api/' % host
+        self.documents = {}
+        for i in range(1, corpus_size + 1):
+            self.documents[i] = self._make_document(i)
+        self.projects = {}
+        self.log = []
+        self.refused_titles = set()
+        self.ranges = True
+        self.requests = 0
+        self.errors = 0
+        self._next_id = corpus_size + 1
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __repr__(self):
+        return '<%s: %s documents>' % (
+            self.__class__.__name__,
+            len(self.documents)
+        )
+
+    def stats(self):
+        """
+        Returns a dictionary of how many requests were answered, and how many
+        of them were made to fail.
+        """
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors}
+
+    def transport(self):
+        """
+        Returns a transport that sends a client's requests straight here.
+        """
+        return FakeTransport(self)
+
+    #
+    # Serving over HTTP
+    #
+
+    def serve(self, host='127.0.0.1', port=0):
+        """
+        Starts answering HTTP requests on a background thread.
+
+        Returns the base_uri to give the client.
+        """
+        fake = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes, which Nagle's
+            # algorithm would hold up on a kept-alive connection
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                url = urllib.parse.urlsplit(self.path)
+                status, header_list, content = fake.handle(
+                    self.command,
+                    url.path,
+                    url.query,
+                    body,
+                    dict(self.headers.items()),
+                    self.headers.get('Host')
+                )
+                self.send_response(status)
+                for key, value in header_list:
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_POST = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return 'http://%s:%s/api/' % (host, self._server.server_port)
+
+    def shutdown(self):
+        """
+        Stops answering HTTP requests.
+        """
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    #
+    # The corpus
+    #
+
+    def _make_document(self, id, title=None):
+        return {
+            'id': id,
+            'slug': 'fake-document-%s' % id,
+            'title': title or 'Fake document %s' % id,
+            'access': 'public',
+            'pages': self.pages,
+            'description': 'A document made up for testing',
+            'source': 'python-documentcloud',
+            'language': 'eng',
+            'created_at': 'Fri, 20 Nov 2015 21:17:08 +0000',
+            'updated_at': 'Fri, 20 Nov 2015 21:17:08 +0000',
+            'contributor': 'Ben Welsh',
+            'contributor_organization': 'Los Angeles Times',
+            'related_article': '',
+            'published_url': '',
+            'data': {},
+            'annotations': [{
+                'id': id,
+                'title': 'A note',
+                'description': 'Something worth pointing out',
+                'page': 1,
+                'access': 'public',
+                'location': {'image': '10,200,40,20'},
+            }],
+            'sections': [{'title': 'Introduction', 'page': 1}],
+            'entities': {
+                'person': [{
+                    'value': 'Ruben Salazar',
+                    'relevance': 0.5,
+                    'occurrences': '10:14',
+                }],
+                'city': [{
+                    'value': 'Los Angeles',
+                    'relevance': 0.3,
+                    'occurrences': '30:11',
+                }],
+            },
+        }
+
+    def _render(self, doc, host, full=True, mentions=0, data=False):
+        """
+        Returns a document's JSON, as the API would.
+        """
+        root = 'http://%s/assets/documents/%s/' % (host, doc['id'])
+        slug = doc['slug']
+        d = {
+            'id': '%s-%s' % (doc['id'], slug),
+            'canonical_url': 'http://%s/documents/%s-%s.html' % (
+                host,
+                doc['id'],
+                slug
+            ),
+            'resources': {
+                'pdf': root + '%s.pdf' % slug,
+                'text': root + '%s.txt' % slug,
+                'thumbnail': root + 'images/%s-p1-thumbnail.gif' % slug,
+                'page': {
+                    'image': root + 'images/%s-p{page}-{size}.gif' % slug,
+                    'text': root + 'pages/%s-p{page}.txt' % slug,
+                },
+            },
+        }
+        for key, value in doc.items():
+            if key in ('id', 'slug', 'entities'):
+                continue
+            elif key in ('related_article', 'published_url'):
+                if value:
+                    d['resources'][key] = value
+            elif full or key not in self.LAZY_FIELDS:
+                d[key] = value
+        if data and not full:
+            d['data'] = doc['data']
+        if mentions:
+            d['mentions'] = [
+                {'page': i, 'text': 'A mention on page %s' % i}
+                for i in range(1, min(mentions, doc['pages']) + 1)
+            ]
+        return d
+
+    def _get_asset(self, path):
+        """
+        Returns the made-up contents of an asset, which are always the same
+        for the same path.
+        """
+        seed = hashlib.sha1(path.encode('utf-8')).hexdigest().encode('utf-8')
+        return (seed * (self.asset_size // len(seed) + 1))[:self.asset_size]
+
+    #
+    # Requests
+    #
+
+    def _json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        return status, [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+        ], body
+
+    def _not_found(self):
+        return self._json(404, {'error': 'Not found'})
+
+    def _refused(self):
+        return self._json(422, {'error': 'Refused'})
+
+    def _get_params(self, query, body, headers):
+        """
+        Returns the parameters from the query string and form body as a
+        list of pairs. Files in a multipart body are given as their SHA-1.
+        """
+        param_list = urllib.parse.parse_qsl(query)
+        match = re.search(r'boundary=([^;\s]+)', headers.get('content-type', ''))
+        if not body:
+            return param_list
+        elif not match:
+            param_list.extend(urllib.parse.parse_qsl(body.decode('utf-8')))
+            return param_list
+        boundary = b'--' + match.group(1).strip('"').encode('utf-8')
+        for part in body.split(boundary):
+            head, sep, value = part.partition(b'\r\n\r\n')
+            name = re.search(b'name="([^"]*)"', head)
+            if not sep or not name:
+                continue
+            # Each value is followed by the line break before the boundary
+            value = value[:-2]
+            if b'filename=' in head:
+                value = hashlib.sha1(value).hexdigest()
+            else:
+                value = value.decode('utf-8')
+            param_list.append((name.group(1).decode('utf-8'), value))
+        return param_list
+
+    def handle(self, method, path, query, body, headers, host):
+        """
+        Answers a request. Returns the status, a list of headers and the
+        body of the response.
+        """
+        headers = dict((k.lower(), v) for k, v in headers.items())
+        if path.startswith('/assets/'):
+            param_list = []
+        else:
+            param_list = self._get_params(query, body, headers)
+        with self._lock:
+            self.log.append((method, path, param_list))
+            self.requests += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            status, header_list, content = self._json(
+                503,
+                {'error': 'Try again'}
+            )
+            return status, header_list + [('Retry-After', '0')], content
+        if path.startswith('/assets/'):
+            return self._handle_asset(path, headers)
+        params = dict(param_list)
+        route = path.split('/api/', 1)[-1]
+        if route == 'search.json':
+            return self._handle_search(params, host)
+        elif route == 'upload.json':
+            return self._handle_upload(params, param_list)
+        elif route == 'projects.json':
+            return self._handle_projects(params, param_list)
+        match = re.match(r'^projects/(\d+)\.json$', route)
+        if match:
+            return self._handle_project(int(match.group(1)), params, param_list)
+        match = re.match(r'^documents/(\d+)[^/]*/entities\.json$', route)
+        if match:
+            doc = self.documents.get(int(match.group(1)))
+            if doc is None:
+                return self._not_found()
+            return self._json(200, {'entities': doc['entities']})
+        match = re.match(r'^documents/(\d+)[^/]*\.json$', route)
+        if match:
+            return self._handle_document(
+                int(match.group(1)),
+                params,
+                param_list,
+                host
+            )
+        return self._not_found()
+
+    def _handle_search(self, params, host):
+        page = int(params.get('page', 1))
+        per_page = min(int(params.get('per_page', 1000)), 1000)
+        mentions = int(params.get('mentions', 3))
+        with self._lock:
+            id_list = sorted(self.documents)
+            start = (page - 1) * per_page
+            doc_list = [
+                self._render(
+                    self.documents[i],
+                    host,
+                    full=False,
+                    mentions=mentions,
+                    data=params.get('data') == 'true'
+                ) for i in id_list[start:start + per_page]
+            ]
+        return self._json(200, {
+            'total': len(id_list),
+            'page': page,
+            'per_page': per_page,
+            'q': params.get('q'),
+            'documents': doc_list,
+        })
+
+    def _handle_document(self, id, params, param_list, host):
+        with self._lock:
+            doc = self.documents.get(id)
+            if doc is None:
+                return self._not_found()
+            method = params.get('_method')
+            if method == 'delete':
+                del self.documents[id]
+                return self._json(200, {})
+            if method == 'put':
+                if params.get('title') in self.refused_titles:
+                    return self._refused()
+                self._update(doc, params, param_list)
+            content = {'document': self._render(doc, host)}
+        return self._json(200, content)
+
+    def _update(self, doc, params, param_list):
+        for key in self.EDITABLE_FIELDS:
+            if key in params:
+                doc[key] = params[key]
+        data = dict(
+            (re.sub(r'^data\[(.*)\]$', r'\1', k), v)
+            for k, v in param_list if k.startswith('data[')
+        )
+        if data:
+            doc['data'] = data
+
+    def _handle_upload(self, params, param_list):
+        if params.get('title') in self.refused_titles:
+            return self._refused()
+        with self._lock:
+            id = self._next_id
+            self._next_id += 1
+            doc = self.documents[id] = self._make_document(id)
+            self._update(doc, params, param_list)
+        return self._json(200, {'id': '%s-%s' % (id, doc['slug'])})
+
+    def _get_document_ids(self, param_list):
+        return [v for k, v in param_list if k == 'document_ids[]']
+
+    def _handle_projects(self, params, param_list):
+        with self._lock:
+            if 'title' not in params:
+                return self._json(200, {
+                    'projects': [self.projects[i] for i in sorted(self.projects)]
+                })
+            # Titles have to be unique
+            if any(p['title'] == params['title'] for p in self.projects.values()):
+                return self._json(200, {'project': {'id': None}})
+            id = max(self.projects or [0]) + 1
+            project = self.projects[id] = {
+                'id': id,
+                'title': params['title'],
+                'description': params.get('description'),
+                'document_ids': self._get_document_ids(param_list),
+            }
+        return self._json(200, {'project': project})
+
+    def _handle_project(self, id, params, param_list):
+        with self._lock:
+            project = self.projects.get(id)
+            if project is None:
+                return self._not_found()
+            method = params.get('_method')
+            if method == 'delete':
+                del self.projects[id]
+                return self._json(200, {})
+            if method == 'put':
+                for key in ('title', 'description'):
+                    if key in params:
+                        project[key] = params[key]
+                document_ids = self._get_document_ids(param_list)
+                if document_ids:
+                    project['document_ids'] = document_ids
+        return self._json(200, {'project': project})
+
+    def _handle_asset(self, path, headers):
+        match = re.match(r'^/assets/documents/(\d+)/', path)
+        if not match or int(match.group(1)) not in self.documents:
+            return self._not_found()
+        if path.endswith('.pdf'):
+            content_type = 'application/pdf'
+        elif path.endswith('.gif'):
+            content_type = 'image/gif'
+        else:
+            content_type = 'text/plain'
+        etag = '"%s"' % hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        if headers.get('if-none-match') == etag:
+            return 304, [('ETag', etag), ('Content-Length', '0')], b''
+        content = self._get_asset(path)
+        status = 200
+        header_list = [('Content-Type', content_type), ('ETag', etag)]
+        match = re.match(r'^bytes=(\d+)-$', headers.get('range') or '')
+        # The range is only for the version the client already has a piece of
+        if not self.ranges or headers.get('if-range') not in (None, etag):
+            match = None
+        if match:
+            start = int(match.group(1))
+            if start >= len(content):
+                return 416, [('Content-Length', '0')], b''
+            status = 206
+            header_list.append(('Content-Range', 'bytes %s-%s/%s' % (
+                start,
+                len(content) - 1,
+                len(content)
+            )))
+            content = content[start:]
+        header_list.append(('Content-Length', str(len(content))))
+        return status, header_list, content
@@ -0,0 +1,132 @@
+"""
+A local record of uploaded files, so bulk uploads can skip duplicates and
+pick up where they left off.
+"""
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+
+def get_file_hash(pdf):
+    """
+    Returns the SHA1 hex digest of a file path or file object, the same
+    fingerprint DocumentCloud reports as a Document's file_hash.
+    """
+    sha1 = hashlib.sha1()
+    if hasattr(pdf, 'read'):
+        position = pdf.tell()
+        pdf.seek(0)
+        for chunk in iter(lambda: pdf.read(1024 * 1024), b''):
+            sha1.update(chunk)
+        pdf.seek(position)
+    else:
+        with open(pdf, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class UploadLedger(object):
+    """
+    A SQLite database of the files that have been uploaded, keyed by the
+    hash of their contents.
+
+    Each upload is committed as soon as it finishes, so if a bulk upload
+    dies halfway, running it again with the same ledger skips everything
+    that already made it up.
+
+    Example usage:
+
+        >> ledger = UploadLedger('/home/ben/uploads.db')
+        >> documentcloud.documents.upload_directory(
+        >>  "/home/ben/pdfs/",
+        >>  ledger=ledger
+        >>)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    file_hash TEXT PRIMARY KEY,
+                    path TEXT,
+                    document_id TEXT,
+                    uploaded_at REAL
+                )
+            """)
+        self.hits = 0
+        # The locks on hashes being uploaded, and how many are waiting on each
+        self._claims = {}
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM uploads"
+            ).fetchone()[0]
+
+    def get(self, file_hash):
+        """
+        Returns the id of the document uploaded with this hash, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT document_id FROM uploads WHERE file_hash = ?",
+                (file_hash,)
+            ).fetchone()
+            if row:
+                self.hits += 1
+        return row[0] if row else None
+
+    def add(self, file_hash, path, document_id):
+        """
+        Records that a file has been uploaded.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?)",
+                (file_hash, path, document_id, time.time())
+            )
+
+    @contextmanager
+    def claim(self, file_hash):
+        """
+        Holds a hash while its file is checked and uploaded. Uploads of
+        copies of the same file at the same time wait their turn, then find
+        it in the ledger rather than sending it again.
+
+        Example usage:
+
+            >> with ledger.claim(file_hash):
+            >>     if not ledger.get(file_hash):
+            >>         ...
+        """
+        with self._lock:
+            lock, count = self._claims.get(file_hash, (threading.Lock(), 0))
+            self._claims[file_hash] = (lock, count + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, count = self._claims[file_hash]
+                if count > 1:
+                    self._claims[file_hash] = (lock, count - 1)
+                else:
+                    del self._claims[file_hash]
+
+    def remove(self, file_hash):
+        """
+        Forgets a file, so that it will be uploaded again.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM uploads WHERE file_hash = ?",
+                (file_hash,)
+            )
+
+    def close(self):
+        self._db.close()
@@ -1,9 +1,29 @@
 """
 A few toys the API will use.
 """
+import os
+import re
 import six
 import time
+import random
+import datetime
+import socket
+import threading
 from functools import wraps
+from six.moves import http_client
+from multiprocessing.pool import ThreadPool
+from email.utils import parsedate_tz, mktime_tz
+from dateutil import tz
+from dateutil.parser import parse as dateparser
+if six.PY3:
+    import urllib.error
+else:
+    from six.moves import urllib
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows
+    fcntl = None
 
 #
 # Exceptions
@@ -37,8 +57,171 @@ class DuplicateObjectError(Exception):
     """
     pass
 
+
+class UploadFailedError(Exception):
+    """
+    Raised when some of the files in a bulk upload could not be uploaded.
+
+    The documents that did upload are kept in `documents`, and the errors
+    for the ones that didn't in `errors`, keyed by file path.
+    """
+    def __init__(self, message, documents=None, errors=None):
+        super(UploadFailedError, self).__init__(message)
+        self.documents = documents or []
+        self.errors = errors or {}
+
+
+class BatchFailedError(Exception):
+    """
+    Raised when some of the writes queued in a batch could not be sent.
+
+    The BulkResult in `result` lists which ones were saved and the errors
+    for the ones that weren't.
+    """
+    def __init__(self, message, result=None):
+        super(BatchFailedError, self).__init__(message)
+        self.result = result
+
+
+#
+# Parsing
+#
+
+ISO_TIMESTAMP = re.compile(
+    r'^(\d{4})-(\d\d)-(\d\d)'
+    r'(?:[T ](\d\d):(\d\d)(?::(\d\d)(?:\.(\d{1,6})\d*)?)?)?'
+    r'\s*(Z|[+-]\d\d(?::?\d\d)?)?$'
+)
+RFC_TIMESTAMP = re.compile(
+    r'^\w{3}, (\d\d?) (\w{3}) (\d{4}) (\d\d):(\d\d):(\d\d) ([+-]\d{4})$'
+)
+MONTHS = dict((m, i + 1) for i, m in enumerate([
+    'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+    'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec',
+]))
+
+
+def _get_tzinfo(offset):
+    """
+    Converts an offset like Z, +0000 or -08:00 into a tzinfo.
+    """
+    if offset is None:
+        return None
+    offset = offset.replace(':', '')
+    if offset == 'Z' or int(offset[1:]) == 0:
+        return tz.tzutc()
+    seconds = int(offset[1:3]) * 3600 + int(offset[3:5] or 0) * 60
+    return tz.tzoffset(None, -seconds if offset[0] == '-' else seconds)
+
+
+def parse_timestamp(value):
+    """
+    Parses the timestamps that come back from the DocumentCloud API.
+
+    The ISO 8601 and RFC 2822 formats the API uses are read with a regular
+    expression, which is much quicker than dateutil's parser. Anything else
+    is handed to dateutil.
+    """
+    match = ISO_TIMESTAMP.match(value) if value else None
+    if match:
+        year, month, day, hour, minute, second, fraction, offset = \
+            match.groups()
+        return datetime.datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour or 0),
+            int(minute or 0),
+            int(second or 0),
+            int(fraction.ljust(6, '0')) if fraction else 0,
+            _get_tzinfo(offset)
+        )
+    match = RFC_TIMESTAMP.match(value) if value else None
+    if match and match.group(2) in MONTHS:
+        day, month, year, hour, minute, second, offset = match.groups()
+        return datetime.datetime(
+            int(year),
+            MONTHS[month],
+            int(day),
+            int(hour),
+            int(minute),
+            int(second),
+            0,
+            _get_tzinfo(offset)
+        )
+    return dateparser(value)
+
 #
-# Decorators
+# Concurrency
+#
+
+
+def bounded_map(func, iterable, workers=4):
+    """
+    Calls func on every item using a fixed number of worker threads.
+
+    Yields the results in the same order as the items went in.
+    """
+    pool = ThreadPool(workers)
+    try:
+        for result in pool.imap(func, iterable):
+            yield result
+    finally:
+        pool.terminate()
+
+
+class BulkResult(object):
+    """
+    The outcome of doing the same thing to many objects at once.
+
+    Lists the ids that were changed, the ids that were skipped because
+    there was nothing to do, and the errors raised for the ids that
+    failed, along with how long it all took.
+    """
+    def __init__(self):
+        self.updated = []
+        self.skipped = []
+        self.errors = {}
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return '<%s: %s updated, %s skipped, %s failed>' % (
+            self.__class__.__name__,
+            len(self.updated),
+            len(self.skipped),
+            len(self.errors),
+        )
+
+    def __len__(self):
+        return len(self.updated) + len(self.skipped) + len(self.errors)
+
+    def add(self, id, outcome):
+        """
+        Records what happened to an object: True if it was changed, False
+        if it was skipped, or the exception that stopped it.
+        """
+        if isinstance(outcome, Exception):
+            self.errors[id] = outcome
+        elif outcome:
+            self.updated.append(id)
+        else:
+            self.skipped.append(id)
+
+    def stats(self):
+        """
+        Returns a dictionary of how many objects were handled and how fast.
+        """
+        return {
+            'total': len(self),
+            'updated': len(self.updated),
+            'skipped': len(self.skipped),
+            'failed': len(self.errors),
+            'seconds': self.seconds,
+            'per_second': len(self) / self.seconds if self.seconds else 0.0,
+        }
+
+#
+# Decorators and policies
 #
 
 
@@ -59,28 +242,269 @@ DocumentCloud client to attempt this type of request.")
     return wraps(method_func)(_checkcredentials)
 
 
-def retry(ExceptionToCheck, tries=3, delay=2, backoff=2):
-    """
-    Retry decorator published by Saltry Crane.
-
-    http://www.saltycrane.com/blog/2009/11/trying-out-retry-decorator-python/
-    """
-    def deco_retry(f):
-        def f_retry(*args, **kwargs):
-            mtries, mdelay = tries, delay
-            try_one_last_time = True
-            while mtries > 1:
-                try:
-                    return f(*args, **kwargs)
-                    try_one_last_time = False
-                    break
-                except ExceptionToCheck:
-                    six.print_("Retrying in %s seconds" % str(mdelay))
-                    time.sleep(mdelay)
-                    mtries -= 1
-                    mdelay *= backoff
-            if try_one_last_time:
-                return f(*args, **kwargs)
-            return
-        return f_retry  # true decorator
-    return deco_retry
+class RetryPolicy(object):
+    """
+    Decides whether, and how long to wait before, a failed request is retried.
+
+    Only transient failures are retried: network errors and the HTTP
+    statuses in `statuses`. Errors on the local machine, like a missing
+    file or a full disk, fail straight away. Waits use "full jitter"
+    exponential backoff, a random time between zero and
+    `backoff * 2 ** attempt` seconds, unless the server says how long to
+    wait with a Retry-After header. No wait is ever longer than
+    `max_backoff`.
+
+    Requests that aren't safe to send twice, like uploads, are called with
+    idempotent=False. A network error or timeout may come after the server
+    has acted on them, so they're only retried on the statuses, unless
+    `retry_unsafe` is set.
+
+    Retries are drawn from a budget so a struggling server isn't swamped.
+    Every request that goes through adds `budget_ratio` to the budget, up to
+    `budget`, and every retry spends one.
+
+    Counts are kept in `stats()` and each retry is reported to the `on_retry`
+    callback, if one is provided, as on_retry(attempt, delay, exception).
+
+    Example usage:
+
+        >> policy = RetryPolicy(max_retries=5, statuses=(429, 503))
+        >> client = DocumentCloud(retry_policy=policy)
+        >> policy.call(urlopen, request, idempotent=False)
+    """
+    # Failures of the network, rather than the local machine. Timeouts are
+    # a kind of OSError in Python 3, like a missing file is, so they have to
+    # be picked out.
+    if six.PY3:
+        NETWORK_ERRORS = (
+            ConnectionError,
+            socket.timeout,
+            http_client.HTTPException,
+        )
+    else:
+        NETWORK_ERRORS = (socket.error, http_client.HTTPException)
+
+    def __init__(
+        self, max_retries=2, backoff=1.0, max_backoff=30.0,
+        statuses=(429, 500, 502, 503, 504), budget=10, budget_ratio=0.1,
+        on_retry=None, retry_unsafe=False
+    ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.on_retry = on_retry
+        self.retry_unsafe = retry_unsafe
+        self.sleep = time.sleep
+        self._tokens = float(budget)
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+        self.budget_exhausted = 0
+
+    def stats(self):
+        """
+        Returns a dictionary of how often requests have been retried.
+        """
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'failures': self.failures,
+                'budget_exhausted': self.budget_exhausted,
+                'budget': self._tokens,
+            }
+
+    def is_retryable(self, e, idempotent=True):
+        """
+        Tests whether an exception looks like a transient failure.
+        """
+        code = getattr(e, 'code', None)
+        if code is not None:
+            return code in self.statuses
+        if not idempotent and not self.retry_unsafe:
+            return False
+        if isinstance(e, urllib.error.URLError):
+            e = e.reason
+        return isinstance(e, self.NETWORK_ERRORS)
+
+    def get_retry_after(self, e):
+        """
+        Returns the number of seconds a Retry-After header asks us to wait,
+        or None if there isn't one.
+        """
+        headers = getattr(e, 'headers', None)
+        value = headers.get('Retry-After') if headers else None
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            date = parsedate_tz(value)
+            if date is None:
+                return None
+            seconds = mktime_tz(date) - time.time()
+        # Don't let the server hold us up forever
+        return min(max(0.0, seconds), self.max_backoff)
+
+    def get_delay(self, attempt, e):
+        """
+        Returns how many seconds to wait before making the nth retry.
+        """
+        retry_after = self.get_retry_after(e)
+        if retry_after is not None:
+            return retry_after
+        ceiling = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def _withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                self.budget_exhausted += 1
+                return False
+            self._tokens -= 1
+            self.retries += 1
+            return True
+
+    def _deposit(self):
+        with self._lock:
+            self._tokens = min(self.budget, self._tokens + self.budget_ratio)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls func, retrying transient failures as the policy allows.
+
+        Pass idempotent=False if the call mustn't be made twice.
+        """
+        idempotent = kwargs.pop('idempotent', True)
+        attempt = 0
+        while True:
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if (
+                    attempt >= self.max_retries or
+                    not self.is_retryable(e, idempotent=idempotent) or
+                    not self._withdraw()
+                ):
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self.get_delay(attempt, e)
+                if self.on_retry:
+                    self.on_retry(attempt + 1, delay, e)
+                self.sleep(delay)
+                attempt += 1
+            else:
+                self._deposit()
+                return result
+
+
+class RateLimiter(object):
+    """
+    A token bucket that spaces out requests to a steady rate.
+
+    The bucket refills at `rate` tokens per second and holds at most `burst`
+    of them. Each request takes a token, waiting for one if the bucket is
+    empty. Waiting callers reserve their token up front, so threads sharing
+    a limiter are let through in turn rather than all at once.
+
+    Example usage:
+
+        >> client = DocumentCloud(rate_limiter=RateLimiter(5))
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.sleep = time.sleep
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waits = 0
+        self.waited = 0.0
+
+    def stats(self):
+        """
+        Returns a dictionary of how much requests have been held back.
+        """
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'waits': self.waits,
+                'waited': self.waited,
+            }
+
+    def _reserve(self, tokens, updated, now):
+        """
+        Takes a token from a bucket last seen holding `tokens` at `updated`.
+
+        Returns the number of tokens left, which is negative if the caller
+        has to wait, and how many seconds that wait is.
+        """
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+        delay = -tokens / self.rate if tokens < 0 else 0.0
+        return tokens, delay
+
+    def _take(self):
+        now = time.time()
+        self._tokens, delay = self._reserve(self._tokens, self._updated, now)
+        self._updated = now
+        return delay
+
+    def acquire(self):
+        """
+        Blocks until the caller is allowed to make a request.
+        """
+        with self._lock:
+            delay = self._take()
+            self.acquired += 1
+            if delay:
+                self.waits += 1
+                self.waited += delay
+        if delay:
+            self.sleep(delay)
+
+
+class FileRateLimiter(RateLimiter):
+    """
+    A token bucket stored in a file, so every process on a host that points
+    at the same path shares one rate.
+
+    Requires a platform with fcntl file locking.
+
+    Example usage:
+
+        >> limiter = FileRateLimiter('/tmp/documentcloud.bucket', 5)
+        >> client = DocumentCloud(rate_limiter=limiter)
+    """
+    def __init__(self, path, rate, burst=1):
+        if fcntl is None:
+            raise NotImplementedError(
+                "FileRateLimiter requires fcntl file locking, which is not \
+available on this platform."
+            )
+        super(FileRateLimiter, self).__init__(rate, burst)
+        self.path = path
+
+    def _take(self):
+        # The file is opened afresh each time so that threads, and processes
+        # forked after it was first used, each take their own lock on it.
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            try:
+                tokens, updated = map(float, os.read(fd, 64).split())
+            except ValueError:
+                # A brand new bucket starts out full
+                tokens, updated = float(self.burst), now
+            tokens, delay = self._reserve(tokens, updated, now)
+            state = ('%r %r' % (tokens, now)).encode('utf-8')
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, state)
+            return delay
+        finally:
+            os.close(fd)
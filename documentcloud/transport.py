@@ -0,0 +1,424 @@
+"""
+The transports that carry the API clients' requests.
+
+Every request the clients make, to the API or for a document's assets, is
+sent through a Transport handed to them when they're created. Anything that
+implements its `request` method can stand in, like the in-process fake in
+documentcloud.fake.
+
+Opening a fresh connection for every API call means paying for a new TCP and
+TLS handshake each time. The ConnectionPool here, which is the default,
+holds on to idle connections, grouped by host, and hands them back out for
+the next request.
+"""
+import ssl
+import errno
+import base64
+import select
+import socket
+import threading
+import six
+from six.moves import http_client
+if six.PY3:
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+else:
+    from six.moves import urllib
+
+
+class Transport(object):
+    """
+    The interface the API clients send their requests through.
+
+    Subclasses implement `request`. It returns a response with `status`,
+    `reason` and `headers` attributes and `read`, `readinto` and `close`
+    methods, like the one http.client gives back. Error statuses are
+    raised as urllib.error.HTTPError, as urllib.request.urlopen would, but
+    304 Not Modified is returned like any other response.
+
+    The API is sent almost everything as a POST, so the method doesn't say
+    whether a request is safe to send twice. The clients say so with the
+    `idempotent` flag instead. When it's None, it's up to the method.
+
+    Example usage:
+
+        >> class LoggingTransport(ConnectionPool):
+        >>     def request(self, method, url, body=None, headers=None,
+        >>                 idempotent=None):
+        >>         print(method, url)
+        >>         return super(LoggingTransport, self).request(
+        >>             method, url, body=body, headers=headers,
+        >>             idempotent=idempotent
+        >>         )
+        >> client = DocumentCloud(transport=LoggingTransport())
+    """
+    def request(self, method, url, body=None, headers=None, idempotent=None):
+        """
+        Makes a request and returns the response.
+        """
+        raise NotImplementedError
+
+    def urlopen(self, request):
+        """
+        Makes a request from a urllib.request.Request object. The clients
+        mark whether it's safe to send twice with an `idempotent` attribute.
+        """
+        return self.request(
+            request.get_method(),
+            request.get_full_url(),
+            body=request.data,
+            headers=dict(request.header_items()),
+            idempotent=getattr(request, 'idempotent', None),
+        )
+
+    def stats(self):
+        """
+        Returns a dictionary of whatever the transport keeps count of.
+        """
+        return {}
+
+    def clear(self):
+        """
+        Lets go of any connections the transport is holding on to.
+        """
+        pass
+
+
+class PooledResponse(object):
+    """
+    A response read over a pooled connection.
+
+    The connection is handed back to the pool as soon as the body has been
+    read to the end. Closing the response early throws the connection away.
+    """
+    def __init__(self, pool, key, conn, response, url):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.msg
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def getcode(self):
+        return self.status
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def getheader(self, name, default=None):
+        return self._response.getheader(name, default)
+
+    def read(self, amt=None):
+        data = self._response.read(amt)
+        self._release_if_done()
+        return data
+
+    def readinto(self, b):
+        n = self._response.readinto(b)
+        self._release_if_done()
+        return n
+
+    def close(self):
+        """
+        Give up on the response, discarding the connection if the body
+        was not read to the end.
+        """
+        if self._conn is None:
+            return
+        if self._response.isclosed():
+            self._release_if_done()
+        else:
+            self._response.close()
+            self._conn.close()
+            self._conn = None
+
+    def _release_if_done(self):
+        if self._conn is None or not self._response.isclosed():
+            return
+        if self._response.will_close:
+            self._conn.close()
+        else:
+            self._pool._put_conn(self._key, self._conn)
+        self._conn = None
+
+
+class ConnectionPool(Transport):
+    """
+    A thread-safe pool of keep-alive HTTP connections.
+
+    Idle connections are stored per scheme, host and port. Up to `maxsize`
+    idle connections are kept for each host; connections opened beyond that
+    during bursts of concurrent requests are closed once they are done.
+
+    Requests go through the proxies in `proxies`, a dictionary of proxy URLs
+    by scheme. By default they're taken from the environment, like
+    urllib.request.urlopen does, so HTTP_PROXY, HTTPS_PROXY and NO_PROXY
+    are honored.
+
+    Example usage:
+
+        >> pool = ConnectionPool(maxsize=20)
+        >> client = DocumentCloud(transport=pool)
+        >> client.documents.get('71072-oir-final-report')
+        >> pool.stats()
+    """
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+    # Requests that can safely be sent twice, unless we're told otherwise
+    IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+    # Errors that mean the server closed an idle connection before it read
+    # the request. Timeouts aren't among them, since the server may well be
+    # working on it.
+    STALE_CONNECTION_ERRORS = (
+        http_client.BadStatusLine,
+        http_client.CannotSendRequest,
+    )
+    STALE_CONNECTION_ERRNOS = (errno.ECONNRESET, errno.EPIPE, errno.ECONNABORTED)
+
+    def __init__(self, maxsize=10, timeout=60, max_redirects=5, proxies=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        if proxies is None:
+            proxies = urllib.request.getproxies()
+        self.proxies = proxies
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+        self.requests = 0
+        self.connections = 0
+        self.reused = 0
+
+    #
+    # Connection management
+    #
+
+    def _get_proxy(self, key):
+        """
+        Returns the host and port of the proxy to reach a host through, and
+        the header to log in to it with, or None if it's reached directly.
+        """
+        scheme, host, port = key
+        proxy = self.proxies.get(scheme)
+        if not proxy or urllib.request.proxy_bypass(host):
+            return None
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+        parts = urllib.parse.urlsplit(proxy)
+        headers = {}
+        if parts.username:
+            credentials = '%s:%s' % (
+                urllib.parse.unquote(parts.username),
+                urllib.parse.unquote(parts.password or '')
+            )
+            headers['Proxy-Authorization'] = 'Basic %s' % (
+                base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+            )
+        return parts.hostname, parts.port or 8080, headers
+
+    def _new_conn(self, key):
+        scheme, host, port = key
+        proxy = self._get_proxy(key)
+        if proxy and scheme == 'https':
+            # Tunnel through the proxy, so it never sees inside
+            conn = http_client.HTTPSConnection(
+                proxy[0],
+                proxy[1],
+                timeout=self.timeout,
+                context=self._ssl_context
+            )
+            conn.set_tunnel(host, port, headers=proxy[2])
+        elif scheme == 'https':
+            conn = http_client.HTTPSConnection(
+                host,
+                port,
+                timeout=self.timeout,
+                context=self._ssl_context
+            )
+        elif proxy:
+            conn = http_client.HTTPConnection(
+                proxy[0],
+                proxy[1],
+                timeout=self.timeout
+            )
+        else:
+            conn = http_client.HTTPConnection(host, port, timeout=self.timeout)
+        with self._lock:
+            self.connections += 1
+        return conn
+
+    @staticmethod
+    def _is_dropped(conn):
+        """
+        Tests whether the server has closed an idle connection. An idle
+        connection that has anything to read has been hung up on.
+        """
+        if conn.sock is None:
+            return True
+        try:
+            return bool(select.select([conn.sock], [], [], 0)[0])
+        except (ValueError, select.error):
+            return True
+
+    def _get_conn(self, key):
+        """
+        Returns an idle connection for the host if one is available, along
+        with a flag saying whether it was reused.
+        """
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    break
+                conn = idle.pop()
+            if self._is_dropped(conn):
+                conn.close()
+                continue
+            with self._lock:
+                self.reused += 1
+            return conn, True
+        return self._new_conn(key), False
+
+    def _put_conn(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def clear(self):
+        """
+        Closes all of the idle connections held by the pool.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conn_list in idle.values():
+            for conn in conn_list:
+                conn.close()
+
+    def stats(self):
+        """
+        Returns a dictionary summarizing how well connections are being reused.
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'reused': self.reused,
+                'reuse_rate': (
+                    float(self.reused) / self.requests if self.requests else 0.0
+                ),
+                'idle': sum(len(i) for i in self._idle.values()),
+            }
+
+    #
+    # Requests
+    #
+
+    def _is_stale(self, e):
+        """
+        Tests whether a request that failed on a reused connection never
+        reached the server.
+        """
+        if isinstance(e, socket.timeout):
+            return False
+        if isinstance(e, self.STALE_CONNECTION_ERRORS):
+            return True
+        return getattr(e, 'errno', None) in self.STALE_CONNECTION_ERRNOS
+
+    def _send(self, method, url, body, headers, idempotent):
+        """
+        Sends a single request and returns the raw response.
+
+        If a reused connection turns out to have been closed by the server,
+        the request is sent once more on a fresh one, as long as it's safe to
+        send twice.
+        """
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        proxy = self._get_proxy(key)
+        if proxy and scheme == 'http':
+            # Plain requests through a proxy name the whole URL
+            path = url
+            headers = dict(headers, **proxy[2])
+        else:
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+        with self._lock:
+            self.requests += 1
+        conn, reused = self._get_conn(key)
+        try:
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+        except (http_client.HTTPException, socket.error) as e:
+            conn.close()
+            if not reused or not idempotent or not self._is_stale(e):
+                raise
+            if hasattr(body, 'seek'):
+                body.seek(0)
+            conn = self._new_conn(key)
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+        return PooledResponse(self, key, conn, response, url)
+
+    def request(self, method, url, body=None, headers=None, idempotent=None):
+        """
+        Makes a request over a pooled connection, following redirects.
+
+        Returns a PooledResponse. Error statuses are raised as
+        urllib.error.HTTPError, just as urllib.request.urlopen would.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in self.IDEMPOTENT_METHODS
+        headers = dict((k.title(), v) for k, v in (headers or {}).items())
+        if 'User-Agent' not in headers:
+            headers['User-Agent'] = 'python-documentcloud'
+        if body is not None and 'Content-Type' not in headers:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for i in range(self.max_redirects + 1):
+            response = self._send(method, url, body, headers, idempotent)
+            location = response.getheader('Location')
+            if response.status not in self.REDIRECT_CODES or not location:
+                break
+            # Drain the redirect so its connection can go back in the pool
+            response.read()
+            new_url = urllib.parse.urljoin(url, location)
+            # Don't hand our credentials to some other host
+            if urllib.parse.urlsplit(new_url).netloc != \
+                    urllib.parse.urlsplit(url).netloc:
+                headers.pop('Authorization', None)
+            url = new_url
+            if response.status == 303 or (
+                response.status in (301, 302) and method == 'POST'
+            ):
+                method, body, idempotent = 'GET', None, True
+                headers.pop('Content-Type', None)
+                headers.pop('Content-Length', None)
+            elif hasattr(body, 'seek'):
+                # A streamed body is sent again from the start
+                body.seek(0)
+        if response.status >= 400:
+            content = response.read()
+            raise urllib.error.HTTPError(
+                url,
+                response.status,
+                response.reason,
+                response.headers,
+                six.BytesIO(content)
+            )
+        return response
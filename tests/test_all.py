@@ -9,22 +9,42 @@ as global environment variables.
 import os
 import sys
 import six
+import json
+import errno
+import hashlib
 import random
+import shutil
+import socket
+import tempfile
 import string
 import textwrap
+import time
 import unittest
+import threading
 try:
     import cStringIO as io
 except ImportError:
     import io
-from copy import copy
+from copy import copy, deepcopy
+from dateutil.parser import parse as dateparser
+from six.moves import http_client, urllib
 from documentcloud import DocumentCloud
+from documentcloud.assets import AssetStore
+from documentcloud.cache import HTTPCache
+from documentcloud.fake import FakeDocumentCloud
+from documentcloud.ledger import UploadLedger
+from documentcloud.MultipartPostHandler import MultipartPostHandler
+from documentcloud.transport import ConnectionPool
 from documentcloud.toolbox import DoesNotExistError
 from documentcloud.toolbox import DuplicateObjectError
 from documentcloud.toolbox import CredentialsFailedError
 from documentcloud.toolbox import CredentialsMissingError
+from documentcloud.toolbox import RetryPolicy
+from documentcloud.toolbox import parse_timestamp
+from documentcloud.toolbox import UploadFailedError, BatchFailedError
+from documentcloud.toolbox import RateLimiter, FileRateLimiter
 from documentcloud import Annotation, Document, Project
-from documentcloud import Section, Entity, Mention
+from documentcloud import Section, Entity, Mention, Resource, DocumentSet
 
 #
 # Odds and ends
@@ -68,6 +88,53 @@ agus Ádhaimh.",
     'ru': 'чащах юга жил бы цитрус? Да, но фальшивый экземпляр!'
 }
 
+
+class LocalServerMixin(object):
+    """
+    Serves a FakeDocumentCloud on localhost for tests that don't need the
+    live API.
+
+    There are 25 documents of 12 pages each, with 100-byte assets. Saves
+    and uploads titled "fail" are refused.
+    """
+    corpus_size = 25
+
+    def setUp(self):
+        self.fake = FakeDocumentCloud(
+            corpus_size=self.corpus_size,
+            pages=12,
+            asset_size=100
+        )
+        self.fake.refused_titles.add('fail')
+        self.base_uri = self.fake.serve()
+
+    def tearDown(self):
+        self.fake.shutdown()
+
+    def get_paths(self, pattern=''):
+        """
+        Returns the paths requested so far that contain `pattern`.
+        """
+        return [path for method, path, params in self.fake.log if pattern in path]
+
+    def get_puts(self):
+        """
+        Returns the parameters of each save sent so far.
+        """
+        return [
+            params for method, path, params in self.fake.log
+            if ('_method', 'put') in params
+        ]
+
+    def get_uploads(self):
+        """
+        Returns the parameters of each upload sent so far.
+        """
+        return [
+            dict(params) for method, path, params in self.fake.log
+            if path.endswith('/upload.json')
+        ]
+
 #
 # Tests
 #
@@ -680,6 +747,1462 @@ class ProjectTest(BaseTest):
             self.assertEqual(obj.__unicode__(), six.text_type(d['title']))
 
 
+class ConnectionPoolTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for the keep-alive transport, run against a local server.
+    """
+    def test_reuse(self):
+        pool = ConnectionPool(maxsize=2)
+        client = DocumentCloud(base_uri=self.base_uri, transport=pool)
+        self.assertTrue(client.documents.transport is pool)
+        self.assertTrue(client.projects.transport is pool)
+        for i in range(5):
+            self.assertEqual(
+                client.fetch('documents/1.json')['document']['id'],
+                '1-fake-document-1'
+            )
+            client.documents.fetch('documents/1.json')
+        stats = pool.stats()
+        self.assertEqual(stats['requests'], 10)
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['reused'], 9)
+        self.assertEqual(stats['reuse_rate'], 0.9)
+        pool.clear()
+        self.assertEqual(pool.stats()['idle'], 0)
+
+    def test_stale(self):
+        class ResetConnection(object):
+            """
+            A kept-alive connection the server has hung up on.
+            """
+            def request(self, *args):
+                raise socket.error(errno.ECONNRESET, 'Connection reset by peer')
+
+            def close(self):
+                pass
+        pool = ConnectionPool()
+        pool._is_dropped = lambda conn: False
+        key = ('http', '127.0.0.1', urllib.parse.urlsplit(self.base_uri).port)
+        # A search is POSTed, but it can be sent again on a fresh connection
+        pool._put_conn(key, ResetConnection())
+        response = pool.request(
+            'POST',
+            self.base_uri + 'search.json',
+            body=b'q=salazar',
+            idempotent=True
+        )
+        self.assertEqual(json.loads(response.read().decode('utf-8'))['total'], 25)
+        # An upload can't
+        pool._put_conn(key, ResetConnection())
+        self.assertRaises(
+            socket.error,
+            pool.request,
+            'POST',
+            self.base_uri + 'upload.json',
+            body=b'title=Test',
+            idempotent=False
+        )
+        self.assertEqual(len(self.get_uploads()), 0)
+
+    def test_redirect(self):
+        location = self.base_uri + 'upload.json'
+
+        class RedirectConnection(object):
+            """
+            Reads the request, then sends it somewhere else.
+            """
+            def request(self, method, path, body, headers):
+                body.read()
+
+            def makefile(self, *args):
+                return six.BytesIO((
+                    'HTTP/1.1 307 Temporary Redirect\r\n'
+                    'Location: %s\r\n'
+                    'Content-Length: 0\r\n'
+                    'Connection: close\r\n\r\n' % location
+                ).encode('utf-8'))
+
+            def getresponse(self):
+                # Read from this, as though it were the socket
+                response = http_client.HTTPResponse(self)
+                response.begin()
+                return response
+
+            def close(self):
+                pass
+        pool = ConnectionPool()
+        pool._is_dropped = lambda conn: False
+        key = ('http', '127.0.0.1', urllib.parse.urlsplit(self.base_uri).port)
+        pool._put_conn(key, RedirectConnection())
+        path = os.path.join(os.path.dirname(__file__), "test.pdf")
+        with open(path, 'rb') as fp:
+            boundary, body = MultipartPostHandler().multipart_stream(
+                [('title', 'Test')],
+                [('file', fp)]
+            )
+            pool.request(
+                'POST',
+                self.base_uri + 'upload.json',
+                body=body,
+                headers={
+                    'Content-Type': 'multipart/form-data; boundary=%s' % boundary,
+                    'Content-Length': str(len(body)),
+                },
+                idempotent=False
+            ).read()
+            fp.seek(0)
+            file_hash = hashlib.sha1(fp.read()).hexdigest()
+        # The whole body was sent again
+        upload = self.get_uploads()[0]
+        self.assertEqual(upload['title'], 'Test')
+        self.assertEqual(upload['file'], file_hash)
+
+    def test_timeout(self):
+        fake = FakeDocumentCloud(corpus_size=1)
+        base_uri = fake.serve()
+        try:
+            pool = ConnectionPool(timeout=0.2)
+            pool.request('GET', base_uri + 'documents/1.json').read()
+            # A slow answer on a reused connection isn't a stale connection,
+            # so the upload mustn't be sent again
+            fake.latency = 0.5
+            with self.assertRaises(socket.timeout):
+                pool.request(
+                    'POST',
+                    base_uri + 'upload.json',
+                    body=b'title=Slow'
+                )
+            time.sleep(0.6)
+            self.assertEqual(fake.stats()['requests'], 2)
+            self.assertEqual(len(fake.documents), 2)
+        finally:
+            fake.shutdown()
+
+    def test_proxy(self):
+        fake = FakeDocumentCloud(corpus_size=1)
+        base_uri = fake.serve()
+        try:
+            proxy = urllib.parse.urlsplit(base_uri).netloc
+            pool = ConnectionPool(proxies={'http': 'http://%s' % proxy})
+            response = pool.request(
+                'GET',
+                'http://documentcloud.invalid/api/documents/1.json'
+            )
+            content = json.loads(response.read().decode('utf-8'))
+            # The proxy was asked for the whole URL
+            self.assertTrue(
+                content['document']['canonical_url'].startswith(
+                    'http://documentcloud.invalid/'
+                )
+            )
+        finally:
+            fake.shutdown()
+
+
+class FakeDocumentCloudTest(unittest.TestCase):
+    """
+    Tests for the in-process fake of the API.
+    """
+    def setUp(self):
+        self.fake = FakeDocumentCloud(corpus_size=1500, pages=3, asset_size=100)
+        self.client = DocumentCloud(
+            'user',
+            'pass',
+            base_uri=self.fake.base_uri,
+            transport=self.fake.transport()
+        )
+
+    def test_search(self):
+        obj_list = self.client.documents.search('salazar')
+        # Two pages of results
+        self.assertEqual(len(obj_list), 1500)
+        self.assertEqual(self.fake.stats()['requests'], 2)
+        obj = obj_list[0]
+        self.assertEqual(obj.id, '1-fake-document-1')
+        self.assertFalse(obj.is_hydrated())
+        self.assertEqual(obj.contributor, 'Ben Welsh')
+        self.assertEqual(len(obj.annotations), 1)
+        self.assertEqual(obj.get_entities()[0].value, 'Ruben Salazar')
+
+    def test_search_short_pages(self):
+        # The server sends no more than 1000 results a page, whatever we ask
+        obj_list = self.client.documents.search('salazar', per_page=2000)
+        self.assertEqual(len(obj_list), 1500)
+        self.assertEqual(obj_list[-1].id, '1500-fake-document-1500')
+        obj_list = self.client.documents.search(
+            'salazar',
+            per_page=2000,
+            workers=4
+        )
+        self.assertEqual(len(obj_list), 1500)
+
+    def test_put(self):
+        obj = self.client.documents.get('2')
+        obj.title = 'Changed'
+        obj.data = {'topic': 'interior'}
+        obj.put()
+        obj = self.client.documents.get('2')
+        self.assertEqual(obj.title, 'Changed')
+        self.assertEqual(obj.data, {'topic': 'interior'})
+        obj.delete()
+        with self.assertRaises(DoesNotExistError):
+            self.client.documents.get('2')
+
+    def test_upload(self):
+        path = os.path.join(os.path.dirname(__file__), "test.pdf")
+        obj = self.client.documents.upload(path, 'Uploaded')
+        self.assertEqual(obj.id, '1501-fake-document-1501')
+        self.assertEqual(obj.title, 'Uploaded')
+
+    def test_projects(self):
+        project = self.client.projects.create('Fake', document_ids=['1', '3'])
+        with self.assertRaises(DuplicateObjectError):
+            self.client.projects.create('Fake')
+        project = self.client.projects.get(title='Fake')
+        self.assertEqual(len(project.document_list), 2)
+        project.delete()
+        self.assertEqual(self.client.projects.all(), [])
+
+    def test_assets(self):
+        obj = self.client.documents.get('1')
+        self.assertEqual(len(obj.get_normal_image(1)), 100)
+        self.assertEqual(obj.get_page_text(2), obj.get_page_text(2))
+        self.assertNotEqual(obj.get_page_text(1), obj.get_page_text(2))
+        path = os.path.join(tempfile.mkdtemp(), 'fake.pdf')
+        response = self.client.transport.request('GET', obj.pdf_url)
+        # A download of this version of the PDF broke off partway
+        with open(path, 'wb') as f:
+            f.write(response.read()[:40])
+        with open(path + '.partial', 'w') as f:
+            json.dump({
+                'url': obj.pdf_url,
+                'validator': response.getheader('ETag'),
+            }, f)
+        self.assertEqual(obj.download_pdf(path), 60)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), obj.pdf)
+        self.assertFalse(os.path.exists(path + '.partial'))
+
+    def test_resume_changed(self):
+        obj = self.client.documents.get('1')
+        path = os.path.join(tempfile.mkdtemp(), 'fake.pdf')
+        # A download of an older version of the PDF broke off partway
+        with open(path, 'wb') as f:
+            f.write(b'x' * 40)
+        with open(path + '.partial', 'w') as f:
+            json.dump({'url': obj.pdf_url, 'validator': '"old"'}, f)
+        self.assertEqual(obj.download_pdf(path), 100)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), obj.pdf)
+        self.assertFalse(os.path.exists(path + '.partial'))
+
+    def test_resume_broken(self):
+        obj = self.client.documents.get('1')
+        transport = self.client.transport
+        request = transport.request
+        calls = []
+
+        def broken(method, url, body=None, headers=None, idempotent=None):
+            response = request(
+                method,
+                url,
+                body=body,
+                headers=headers,
+                idempotent=idempotent
+            )
+            calls.append(dict((k.lower(), v) for k, v in headers.items()))
+            if len(calls) == 1:
+                # The connection drops after 30 bytes
+                body = response._body
+
+                def left():
+                    if body.tell() >= 30:
+                        raise socket.error(errno.ECONNRESET, 'Reset')
+                    return 30 - body.tell()
+                response.read = lambda amt=None: body.read(left())
+                response.readinto = lambda b: body.readinto(
+                    memoryview(b)[:left()]
+                )
+            return response
+        transport.request = broken
+        self.client.retry_policy.sleep = lambda delay: None
+        f = six.BytesIO()
+        self.assertEqual(obj.download_pdf(f), 100)
+        self.assertEqual(f.getvalue(), obj.pdf)
+        # The rest was only asked for if it was the same version
+        self.assertEqual(calls[1]['range'], 'bytes=30-')
+        self.assertTrue(calls[1]['if-range'].startswith('"'))
+
+    def test_errors(self):
+        fake = FakeDocumentCloud(corpus_size=10, error_rate=0.5, seed=1)
+        policy = RetryPolicy(max_retries=10, budget=100)
+        policy.sleep = lambda delay: None
+        client = DocumentCloud(
+            base_uri=fake.base_uri,
+            transport=fake.transport(),
+            retry_policy=policy
+        )
+        for i in range(1, 11):
+            self.assertEqual(client.documents.get(str(i)).pages, 10)
+        self.assertTrue(fake.stats()['errors'] > 0)
+        self.assertEqual(policy.stats()['retries'], fake.stats()['errors'])
+
+    def test_serve(self):
+        base_uri = self.fake.serve()
+        try:
+            client = DocumentCloud(base_uri=base_uri)
+            obj = client.documents.get('1')
+            self.assertEqual(obj.title, 'Fake document 1')
+            self.assertTrue(obj.pdf_url.startswith(base_uri.split('/api/')[0]))
+            self.assertEqual(len(obj.pdf), 100)
+        finally:
+            self.fake.shutdown()
+
+
+@unittest.skipIf(six.PY2, "asyncio is only available in Python 3")
+class AsyncTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for the asyncio client, run against a local server.
+    """
+    def test_get(self):
+        import asyncio
+        from documentcloud.aio import AsyncDocumentCloud
+
+        async def get_all():
+            async with AsyncDocumentCloud(
+                base_uri=self.base_uri,
+                max_workers=4
+            ) as client:
+                return await asyncio.gather(*[
+                    client.documents.get('1') for i in range(10)
+                ])
+        obj_list = asyncio.run(get_all())
+        self.assertEqual(len(obj_list), 10)
+        self.assertTrue(isinstance(obj_list[0], Document))
+        self.assertEqual(obj_list[0].title, 'Fake document 1')
+
+
+class LocalSearchTest(LocalServerMixin, unittest.TestCase):
+    """
+    Search pagination tests, run against a local server.
+    """
+    def setUp(self):
+        super(LocalSearchTest, self).setUp()
+        self.client = DocumentCloud(base_uri=self.base_uri)
+
+    def test_search(self):
+        obj_list = self.client.documents.search('foo', per_page=10)
+        self.assertEqual(len(obj_list), 25)
+        self.assertEqual(obj_list[-1].id, '25-fake-document-25')
+
+    def test_compact(self):
+        client = DocumentCloud(base_uri=self.base_uri, compact=True)
+        self.assertTrue(client.documents.compact)
+        obj_list = client.documents.search('foo', per_page=10)
+        self.assertEqual(obj_list[-1].id, '25-fake-document-25')
+        self.assertTrue(obj_list[-1]._connection is client)
+
+    def test_iter_search(self):
+        obj_iter = self.client.documents.iter_search('foo', per_page=10)
+        self.assertFalse(isinstance(obj_iter, list))
+        obj = next(obj_iter)
+        self.assertTrue(isinstance(obj, Document))
+        self.assertEqual(obj.id, '1-fake-document-1')
+        # Nothing past the first page is fetched until it is needed
+        self.assertEqual(len(self.get_paths()), 1)
+        self.assertEqual(len(list(obj_iter)), 24)
+
+    def test_search_workers(self):
+        obj_list = self.client.documents.search('foo', per_page=10, workers=3)
+        self.assertEqual([i.id for i in obj_list], [
+            '%s-fake-document-%s' % (i, i) for i in range(1, 26)
+        ])
+        # The total on the first page saves asking for an empty fourth one
+        self.assertEqual(len(self.get_paths()), 3)
+
+    def test_iter_search_limit(self):
+        obj_list = list(
+            self.client.documents.iter_search('foo', per_page=10, limit=15)
+        )
+        self.assertEqual(len(obj_list), 15)
+        self.assertEqual(len(self.get_paths()), 2)
+        obj_list = list(
+            self.client.documents.iter_search('foo', per_page=10, limit=5)
+        )
+        self.assertEqual(len(obj_list), 5)
+        self.assertEqual(len(self.get_paths()), 3)
+
+    def test_hydrate(self):
+        self.fake.documents[5]['data'] = {'id': '5'}
+        obj_list = self.client.documents.search('foo', per_page=10)
+        self.assertFalse(obj_list[0].is_hydrated())
+        self.client.documents.hydrate(obj_list[:5], fields=['contributor'])
+        self.assertEqual(len(self.get_paths()), 8)
+        self.assertEqual(obj_list[4].contributor, 'Ben Welsh')
+        self.assertEqual(obj_list[4].data, {'id': '5'})
+        # Documents that already have the fields are skipped
+        self.client.documents.hydrate(obj_list, workers=4)
+        self.assertEqual(len(self.get_paths()), 28)
+        self.assertTrue(all(obj.is_hydrated() for obj in obj_list))
+
+    def test_search_hydrate(self):
+        obj_list = self.client.documents.search(
+            'foo',
+            per_page=10,
+            hydrate=True
+        )
+        self.assertEqual(len(self.get_paths()), 3)
+        # Touching one document's lazy fields fills in all of them at once
+        self.assertEqual(obj_list[7].contributor, 'Ben Welsh')
+        self.assertEqual(len(self.get_paths()), 28)
+        self.assertEqual(obj_list[20].contributor, 'Ben Welsh')
+        self.assertEqual(len(self.get_paths()), 28)
+        self.assertFalse('_batch' in obj_list[0].__dict__)
+
+    def test_search_hydrate_partial(self):
+        obj_list = self.client.documents.search('foo', per_page=10)
+        self.client.documents.hydrate(obj_list[:2])
+        self.client.documents._batch(obj_list)
+        # Documents that are already hydrated aren't tied to the others
+        self.assertFalse('_batch' in obj_list[0].__dict__)
+        self.assertTrue('_batch' in obj_list[2].__dict__)
+        obj_list[2].contributor
+        self.assertFalse(any('_batch' in obj.__dict__ for obj in obj_list))
+
+
+class LocalPutTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for saving changes, run against a local server.
+    """
+    def setUp(self):
+        super(LocalPutTest, self).setUp()
+        self.client = DocumentCloud('user', 'pass', base_uri=self.base_uri)
+
+    def test_document(self):
+        obj = self.client.documents.get('1')
+        # Nothing has changed, so nothing is sent
+        obj.title = obj.title
+        obj.data
+        obj.save()
+        self.assertEqual(self.get_puts(), [])
+        self.assertEqual(self.client.skipped_writes, 1)
+        # Only the changes are
+        obj.title = 'New Title'
+        obj.data['foo'] = 'bar'
+        obj.related_article = 'http://example.com'
+        obj.put()
+        self.assertEqual(sorted(self.get_puts()[0]), [
+            ('_method', 'put'),
+            ('data[foo]', 'bar'),
+            ('related_article', 'http://example.com'),
+            ('title', 'New Title'),
+        ])
+        # And once they are saved they aren't sent again
+        obj.put()
+        self.assertEqual(len(self.get_puts()), 1)
+        obj.data['foo'] = 'baz'
+        obj.put()
+        self.assertEqual(sorted(self.get_puts()[1]), [
+            ('_method', 'put'),
+            ('data[foo]', 'baz'),
+        ])
+        self.assertEqual(self.client.skipped_writes, 2)
+
+    def test_project(self):
+        self.fake.projects[1] = {
+            'id': 1,
+            'title': 'Test',
+            'description': 'Testing',
+            'document_ids': ['1-fake-document-1'],
+        }
+        obj = Project(dict(self.fake.projects[1], _connection=self.client))
+        obj.put()
+        self.assertEqual(self.get_puts(), [])
+        obj.description = 'Still testing'
+        obj.put()
+        self.assertEqual(sorted(self.get_puts()[0]), [
+            ('_method', 'put'),
+            ('description', 'Still testing'),
+        ])
+        obj.document_list.append(self.client.documents.get('2'))
+        obj.put()
+        self.assertEqual(sorted(self.get_puts()[1]), [
+            ('_method', 'put'),
+            ('document_ids[]', '1-fake-document-1'),
+            ('document_ids[]', '2-fake-document-2'),
+        ])
+        obj.put()
+        self.assertEqual(len(self.get_puts()), 2)
+        self.assertEqual(self.client.skipped_writes, 2)
+
+    def test_project_short_ids(self):
+        obj = Project({
+            'id': 1,
+            'title': 'Test',
+            'document_ids': [1, '2'],
+            '_connection': self.client,
+        })
+        # The documents come back with their slugs, but nothing has changed
+        self.assertEqual(
+            [i.id for i in obj.document_list],
+            ['1-fake-document-1', '2-fake-document-2']
+        )
+        self.assertEqual(obj.get_changes(), {})
+        obj.put()
+        self.assertEqual(self.get_puts(), [])
+        obj.document_list.reverse()
+        self.assertEqual(obj.get_changes(), {
+            'document_ids': ['2-fake-document-2', '1-fake-document-1'],
+        })
+
+    def test_bulk_update(self):
+        obj_list = self.client.documents.search('foo', per_page=10)[:3]
+        obj_list[0].title = 'New Title'
+        obj_list[1].data = {'foo': 'bar'}
+        result = self.client.documents.bulk_update(
+            obj_list + [
+                ('4', {'source': 'Test'}),
+                ('5', {'title': 'fail'}),
+            ],
+            workers=3,
+            rate=1000,
+        )
+        self.assertEqual(
+            sorted(result.updated),
+            ['1-fake-document-1', '2-fake-document-2', '4']
+        )
+        self.assertEqual(result.skipped, ['3-fake-document-3'])
+        self.assertEqual(list(result.errors), ['5'])
+        self.assertTrue(isinstance(result.errors['5'], Exception))
+        # The refused save was sent, but didn't stick
+        self.assertEqual(len(self.get_puts()), 4)
+        self.assertEqual(self.fake.documents[5]['title'], 'Fake document 5')
+        self.assertEqual(self.fake.documents[4]['source'], 'Test')
+        stats = result.stats()
+        self.assertEqual(stats['total'], 5)
+        self.assertEqual(stats['failed'], 1)
+        self.assertTrue(stats['per_second'] > 0)
+        # The saved changes aren't sent again
+        result = self.client.documents.bulk_update(obj_list)
+        self.assertEqual(len(result.skipped), 3)
+        # Bad data is caught before it's sent
+        result = self.client.documents.bulk_update([
+            ('4', {'data': {'a': 1}})
+        ])
+        self.assertTrue(isinstance(result.errors['4'], TypeError))
+        self.assertEqual(len(self.get_puts()), 4)
+
+    def test_batch(self):
+        obj = self.client.documents.get('1')
+        duplicate = self.client.documents.get('1')
+        other = self.client.documents.get('2')
+        with self.client.batch() as batch:
+            obj.title = 'New Title'
+            obj.save()
+            obj.data['foo'] = 'bar'
+            obj.save()
+            duplicate.data = {'boom': 'bap'}
+            duplicate.save()
+            other.save()
+            other.delete()
+            self.assertEqual(len(batch), 2)
+            self.assertEqual(self.get_puts(), [])
+        # The saves were combined into one request, and the delete replaced
+        # the save queued before it
+        self.assertEqual(sorted(self.get_puts()[0]), [
+            ('_method', 'put'),
+            ('data[boom]', 'bap'),
+            ('data[foo]', 'bar'),
+            ('title', 'New Title'),
+        ])
+        self.assertEqual(len(self.get_puts()), 1)
+        # The two are sent at the same time, so either can come first
+        self.assertEqual(sorted(self.get_paths()[-2:]), [
+            '/api/documents/1-fake-document-1.json',
+            '/api/documents/2.json',
+        ])
+        self.assertFalse(2 in self.fake.documents)
+        self.assertEqual(
+            sorted(batch.result.updated),
+            ['1-fake-document-1', '2-fake-document-2']
+        )
+        self.assertEqual(self.client._write_batch, None)
+        # Nothing is queued once the batch is over
+        obj.title = 'Newer Title'
+        obj.save()
+        self.assertEqual(len(self.get_puts()), 2)
+
+    def test_batch_error(self):
+        obj = self.client.documents.get('1')
+        with self.assertRaises(ValueError):
+            with self.client.batch() as batch:
+                obj.title = 'New Title'
+                obj.save()
+                raise ValueError("Something went wrong halfway")
+        # Nothing was sent, and the change is still waiting to be saved
+        self.assertEqual(self.get_puts(), [])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(self.fake.documents[1]['title'], 'Fake document 1')
+        self.assertEqual(obj.get_changes(), {'title': 'New Title'})
+        self.assertEqual(self.client._write_batch, None)
+
+    def test_batch_threads(self):
+        obj = self.client.documents.get('1')
+        other = self.client.documents.get('2')
+        with self.client.batch() as batch:
+            obj.title = 'New Title'
+            obj.save()
+            # Another thread using the same client isn't caught up in it
+            other.title = 'Other Title'
+            thread = threading.Thread(target=other.save)
+            thread.start()
+            thread.join()
+            self.assertEqual(len(batch), 1)
+            self.assertEqual(len(self.get_puts()), 1)
+            self.assertTrue(('title', 'Other Title') in self.get_puts()[0])
+        self.assertEqual(len(self.get_puts()), 2)
+        self.assertTrue(('title', 'New Title') in self.get_puts()[1])
+
+    def test_batch_max_size(self):
+        obj_list = self.client.documents.search('foo', per_page=10)[:5]
+        with self.assertRaises(BatchFailedError) as context:
+            with self.client.batch(max_size=2) as batch:
+                for obj in obj_list:
+                    obj.title = 'fail' if obj is obj_list[-1] else 'New Title'
+                    obj.save()
+                    # It's flushed whenever two are waiting
+                    self.assertTrue(len(batch) < 2)
+                self.assertEqual(len(self.get_puts()), 4)
+        self.assertEqual(
+            list(context.exception.result.errors),
+            ['5-fake-document-5']
+        )
+        self.assertEqual(len(batch.result.updated), 4)
+
+
+class LocalDownloadTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for downloading a document's assets, run against a local server.
+    """
+    def setUp(self):
+        super(LocalDownloadTest, self).setUp()
+        self.client = DocumentCloud(base_uri=self.base_uri)
+        self.obj = self.client.documents.get('1')
+        self.dest = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(LocalDownloadTest, self).tearDown()
+        shutil.rmtree(self.dest)
+
+    def test_download_pages(self):
+        download = self.obj.download_pages('text', workers=3)
+        item_list = list(download)
+        self.assertEqual([i[0] for i in item_list], list(range(1, 13)))
+        self.assertEqual(item_list[4][1], self.obj.get_page_text(5))
+        stats = download.stats()
+        self.assertEqual(stats['pages'], 12)
+        self.assertEqual(stats['bytes'], 1200)
+        self.assertTrue(stats['pages_per_second'] > 0)
+        # Going through it again doesn't count the pages twice
+        self.assertEqual(len(list(download)), 12)
+        self.assertEqual(download.stats()['pages'], 12)
+        self.assertEqual(download.stats()['bytes'], 1200)
+        self.assertRaises(ValueError, self.obj.download_pages, 'huge')
+
+    def test_download_pages_dest(self):
+        download = self.obj.download_pages(
+            'large',
+            pages=[3, 1, 2],
+            workers=2,
+            dest=os.path.join(self.dest, 'images'),
+        )
+        self.assertEqual([i[0] for i in download], [3, 1, 2])
+        self.assertEqual(
+            [os.path.basename(i) for i in download.paths],
+            [
+                'fake-document-1-p3-large.gif',
+                'fake-document-1-p1-large.gif',
+                'fake-document-1-p2-large.gif',
+            ]
+        )
+        with open(download.paths[0], 'rb') as f:
+            self.assertEqual(f.read(), self.obj.get_large_image(3))
+        self.assertEqual(download.count, 3)
+
+    def test_download_pdf(self):
+        expected = self.obj.pdf
+        path = os.path.join(self.dest, 'test.pdf')
+        self.assertEqual(self.obj.download_pdf(path, chunk_size=16), 100)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        # An open file works too
+        f = six.BytesIO()
+        self.assertEqual(self.obj.download_full_text(f), 100)
+        self.assertEqual(f.getvalue(), self.obj.full_text)
+
+    def write_partial(self, path, length):
+        """
+        Leaves what a download of the PDF that broke off partway would.
+        """
+        response = urllib.request.urlopen(self.obj.pdf_url)
+        with open(path, 'wb') as f:
+            f.write(response.read()[:length])
+        with open(path + '.partial', 'w') as f:
+            json.dump({
+                'url': self.obj.pdf_url,
+                'validator': response.info()['ETag'],
+            }, f)
+        response.close()
+
+    def test_download_resume(self):
+        expected = self.obj.pdf
+        path = os.path.join(self.dest, 'test.pdf')
+        self.write_partial(path, 30)
+        self.assertEqual(self.obj.download_pdf(path, chunk_size=16), 70)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        self.assertFalse(os.path.exists(path + '.partial'))
+        # If it's all there already, there's nothing to get
+        self.write_partial(path, 100)
+        self.assertEqual(self.obj.download_pdf(path), 0)
+        # A finished download isn't mistaken for an unfinished one
+        self.assertEqual(self.obj.download_pdf(path), 100)
+        # Nor is any other file that happens to be at the path
+        other = self.client.documents.get('2')
+        self.assertEqual(other.download_pdf(path), 100)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), other.pdf)
+        with open(path, 'wb') as f:
+            f.write(expected[:30])
+        self.assertEqual(self.obj.download_pdf(path), 100)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        # A server that ignores the range sends it all again
+        self.fake.ranges = False
+        self.write_partial(path, 30)
+        self.assertEqual(self.obj.download_pdf(path), 100)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        # Unless we'd rather start over
+        self.fake.ranges = True
+        self.write_partial(path, 30)
+        self.assertEqual(self.obj.download_pdf(path, resume=False), 100)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+
+class LocalProjectTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for a project's documents, run against a local server.
+    """
+    def setUp(self):
+        super(LocalProjectTest, self).setUp()
+        self.client = DocumentCloud(base_uri=self.base_uri)
+        self.obj = Project({
+            'id': 1,
+            'title': 'Test',
+            'document_ids': [
+                '3-fake-document-3',
+                '1-fake-document-1',
+                '4-fake-document-4',
+                '2-fake-document-2',
+            ],
+            '_connection': self.client,
+        })
+
+    def test_document_list(self):
+        obj_list = self.obj.get_document_list(workers=3)
+        self.assertTrue(isinstance(obj_list, DocumentSet))
+        self.assertEqual(
+            [i.id for i in obj_list],
+            self.obj.document_ids
+        )
+        self.assertEqual(len(self.get_paths()), 4)
+        self.assertTrue(self.obj.document_list is obj_list)
+
+    def test_lazy_document_list(self):
+        obj_list = self.obj.get_document_list(workers=2, lazy=True)
+        self.assertEqual(len(obj_list), 4)
+        self.assertTrue('4-fake-document-4' in obj_list)
+        self.assertEqual(len(self.get_paths()), 0)
+        self.assertEqual(obj_list[-2].id, '4-fake-document-4')
+        self.assertEqual(
+            obj_list.get('4-fake-document-4').title,
+            'Fake document 4'
+        )
+        self.assertEqual(len(self.get_paths()), 1)
+        # Iterating fetches a couple at a time
+        obj_iter = iter(obj_list)
+        self.assertEqual(next(obj_iter).id, '3-fake-document-3')
+        self.assertEqual(len(self.get_paths()), 3)
+        self.assertEqual(
+            [i.id for i in obj_iter],
+            self.obj.document_ids[1:]
+        )
+        self.assertEqual(len(self.get_paths()), 4)
+        self.assertEqual(
+            [i.id for i in obj_list[1:3]],
+            self.obj.document_ids[1:3]
+        )
+        self.assertEqual(len(self.get_paths()), 4)
+        self.assertRaises(IndexError, obj_list.__getitem__, 4)
+        self.assertFalse('document_list' in self.obj.__dict__)
+
+
+class LocalProjectClientTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for looking up projects, run against a local server.
+    """
+    def setUp(self):
+        super(LocalProjectClientTest, self).setUp()
+        self.client = DocumentCloud('user', 'pass', base_uri=self.base_uri)
+        for id, title in [(1, 'Salazar'), (2, 'Arizona Shootings')]:
+            self.fake.projects[id] = {
+                'id': id,
+                'title': title,
+                'description': None,
+                'document_ids': [],
+            }
+
+    def count(self):
+        return len(self.get_paths('projects.json'))
+
+    def test_get(self):
+        self.assertEqual(self.client.projects.get(1).title, 'Salazar')
+        self.assertEqual(self.client.projects.get_by_title(
+            ' arizona shootings'
+        ).id, 2)
+        self.assertRaises(DoesNotExistError, self.client.projects.get, 3)
+        # Every lookup used the same download
+        self.assertEqual(self.count(), 1)
+        # Each lookup gets its own copy
+        obj = self.client.projects.get(1)
+        obj.title = 'Changed'
+        self.assertEqual(self.client.projects.get(1).title, 'Salazar')
+        obj.document_ids.append('1-fake-document-1')
+        self.assertEqual(self.client.projects.get(1).document_ids, [])
+        self.assertEqual(self.count(), 1)
+        # Until it expires
+        self.client.projects.index_ttl = 0
+        self.client.projects.get(1)
+        self.assertEqual(self.count(), 2)
+
+    def test_invalidate(self):
+        obj, created = self.client.projects.get_or_create_by_title('Salazar')
+        self.assertFalse(created)
+        obj, created = self.client.projects.get_or_create_by_title('New')
+        self.assertTrue(created)
+        self.assertEqual(obj.id, 3)
+        self.assertEqual(self.count(), 3)
+        self.client.projects.get_by_title('new')
+        self.assertEqual(self.count(), 3)
+        # Edits and deletes clear the index
+        obj.title = 'Newer'
+        obj.put()
+        self.client.projects.get(3)
+        self.assertEqual(self.count(), 4)
+        obj.delete()
+        self.assertEqual(self.client.projects._index, None)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    """
+    Tests for deciding which failures get retried.
+    """
+    def setUp(self):
+        self.policy = RetryPolicy(max_retries=3, budget=2, budget_ratio=0.5)
+        self.delays = []
+        self.policy.sleep = self.delays.append
+        self.calls = 0
+
+    def fail_with(self, e, times=1):
+        failures = []
+
+        def func():
+            self.calls += 1
+            if len(failures) < times:
+                failures.append(e)
+                raise e
+            return 'ok'
+        return func
+
+    def http_error(self, code, headers=None):
+        return urllib.error.HTTPError(
+            'http://example.com', code, 'Oops', headers or {}, None
+        )
+
+    def test_transient(self):
+        e = socket.error(errno.ECONNRESET, 'Connection reset by peer')
+        self.assertEqual(self.policy.call(self.fail_with(e)), 'ok')
+        self.assertEqual(
+            self.policy.call(self.fail_with(self.http_error(503))),
+            'ok'
+        )
+        self.assertEqual(self.calls, 4)
+        self.assertEqual(self.policy.stats()['retries'], 2)
+        # Full jitter never waits longer than the backoff ceiling
+        self.assertTrue(all(0 <= i <= 1 for i in self.delays))
+
+    def test_permanent(self):
+        for e in [self.http_error(404), DoesNotExistError()]:
+            self.assertRaises(type(e), self.policy.call, self.fail_with(e))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.policy.stats()['retries'], 0)
+        self.assertEqual(self.policy.stats()['failures'], 2)
+
+    def test_local(self):
+        # Trouble on this machine isn't going to clear up by waiting
+        for code in [errno.ENOENT, errno.EACCES, errno.ENOSPC]:
+            e = OSError(code, os.strerror(code))
+            self.assertRaises(OSError, self.policy.call, self.fail_with(e))
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.policy.stats()['retries'], 0)
+
+    def test_unsafe(self):
+        e = socket.timeout('timed out')
+        self.assertRaises(
+            socket.timeout,
+            self.policy.call,
+            self.fail_with(e),
+            idempotent=False
+        )
+        # A status means the server didn't act on it
+        self.assertEqual(
+            self.policy.call(self.fail_with(self.http_error(503)), idempotent=False),
+            'ok'
+        )
+        self.assertEqual(self.calls, 3)
+        # Unless we say it's safe
+        self.policy.retry_unsafe = True
+        self.assertEqual(self.policy.call(self.fail_with(e), idempotent=False), 'ok')
+
+    def test_posted(self):
+        fake = FakeDocumentCloud(corpus_size=10)
+        transport = fake.transport()
+        request = transport.request
+        failures = []
+
+        def flaky(method, url, body=None, headers=None, idempotent=None):
+            if not failures:
+                failures.append(url)
+                raise socket.error(errno.ECONNRESET, 'Connection reset by peer')
+            return request(
+                method,
+                url,
+                body=body,
+                headers=headers,
+                idempotent=idempotent
+            )
+        transport.request = flaky
+        client = DocumentCloud(
+            'user',
+            'pass',
+            base_uri=fake.base_uri,
+            transport=transport,
+            retry_policy=self.policy
+        )
+        # Searches are POSTed, but asking twice does no harm
+        self.assertEqual(len(client.documents.search('salazar')), 10)
+        self.assertEqual(self.policy.stats()['retries'], 1)
+        # Uploads aren't sent again
+        del failures[:]
+        path = os.path.join(os.path.dirname(__file__), "test.pdf")
+        self.assertRaises(socket.error, client.documents.upload, path)
+        self.assertEqual(self.policy.stats()['retries'], 1)
+        self.assertEqual(len(fake.documents), 10)
+
+    def test_upload(self):
+        fake = FakeDocumentCloud(corpus_size=1, latency=0.5)
+        base_uri = fake.serve()
+        try:
+            client = DocumentCloud(
+                'user',
+                'pass',
+                base_uri=base_uri,
+                transport=ConnectionPool(timeout=0.2),
+                retry_policy=self.policy
+            )
+            path = os.path.join(os.path.dirname(__file__), "test.pdf")
+            self.assertRaises(Exception, client.documents.upload, path, 'Slow')
+            time.sleep(0.6)
+            # It timed out, but it still only went up once
+            self.assertEqual(fake.stats()['requests'], 1)
+            self.assertEqual(len(fake.documents), 2)
+        finally:
+            fake.shutdown()
+
+    def test_retry_after(self):
+        e = self.http_error(429, {'Retry-After': '7'})
+        self.policy.call(self.fail_with(e))
+        self.assertEqual(self.delays, [7.0])
+        # But it can't keep us waiting longer than the longest backoff
+        e = self.http_error(429, {'Retry-After': '3600'})
+        self.policy.call(self.fail_with(e))
+        self.assertEqual(self.delays, [7.0, 30.0])
+
+    def test_budget(self):
+        e = self.http_error(500)
+        self.assertRaises(
+            urllib.error.HTTPError,
+            self.policy.call,
+            self.fail_with(e, times=10)
+        )
+        # Only two retries were allowed before the budget ran dry
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.policy.stats()['budget_exhausted'], 1)
+
+
+class RateLimiterTest(unittest.TestCase):
+    """
+    Tests for the token bucket rate limiters.
+    """
+    def test_rate(self):
+        limiter = RateLimiter(10)
+        delays = []
+        limiter.sleep = delays.append
+        for i in range(3):
+            limiter.acquire()
+        # The first token is free, then each caller waits its turn
+        self.assertEqual(len(delays), 2)
+        self.assertTrue(0.09 < delays[0] <= 0.1)
+        self.assertTrue(0.19 < delays[1] <= 0.2)
+        self.assertEqual(limiter.stats()['waits'], 2)
+
+    @unittest.skipIf(sys.platform == 'win32', "Requires fcntl")
+    def test_shared_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'bucket')
+        first = FileRateLimiter(path, 10)
+        second = FileRateLimiter(path, 10)
+        delays = []
+        first.sleep = second.sleep = delays.append
+        first.acquire()
+        second.acquire()
+        self.assertEqual(len(delays), 1)
+        self.assertTrue(0.09 < delays[0] <= 0.1)
+
+
+class HTTPCacheTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for revalidating cached responses, run against a local server.
+    """
+    def setUp(self):
+        super(HTTPCacheTest, self).setUp()
+        self.cache = HTTPCache(tempfile.mkdtemp(), max_size=1000)
+        self.client = DocumentCloud(base_uri=self.base_uri, cache=self.cache)
+        self.url = self.base_uri.replace(
+            '/api/',
+            '/assets/documents/%s/fake-document.txt'
+        )
+
+    def test_not_modified(self):
+        obj = self.client.documents.get('1')
+        text = obj.full_text
+        self.assertEqual(len(text), 100)
+        self.assertEqual(obj.full_text, text)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        # The JSON from the API was saved too, but has no validators
+        self.assertEqual(self.cache.stats()['misses'], 2)
+        self.assertEqual(len(os.listdir(self.cache.path)), 1)
+
+    def test_eviction(self):
+        for i in range(1, 13):
+            self.client.download(self.url % i)
+        stats = self.cache.stats()
+        self.assertTrue(stats['size'] <= 1000)
+        self.assertTrue(stats['evictions'] > 0)
+        # The oldest are the ones that got thrown out
+        self.assertEqual(self.cache.get(self.url % 1), None)
+        self.assertNotEqual(self.cache.get(self.url % 12), None)
+
+
+class AssetStoreTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for keeping downloaded assets on disk, run against a local server.
+    """
+    def setUp(self):
+        super(AssetStoreTest, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.store = AssetStore(self.path, max_size=1000)
+        self.client = DocumentCloud(
+            base_uri=self.base_uri,
+            asset_store=self.store
+        )
+        self.url = self.base_uri.replace(
+            '/api/',
+            '/assets/documents/%s/fake-document.txt'
+        )
+
+    def tearDown(self):
+        super(AssetStoreTest, self).tearDown()
+        self.store.close()
+        shutil.rmtree(self.path)
+
+    def count(self):
+        return len(self.get_paths('/assets/'))
+
+    def test_hit(self):
+        obj = self.client.documents.get('1')
+        text = obj.full_text
+        self.assertEqual(obj.full_text, text)
+        self.assertEqual(obj.get_page_text(1), obj.get_page_text(1))
+        self.assertEqual(self.count(), 2)
+        stats = self.store.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['size'], 200)
+
+    def test_content_addressed(self):
+        self.store.set('http://example.com/a.txt', b'same')
+        self.store.set('http://example.com/b.txt', b'same')
+        self.assertEqual(self.store.get('http://example.com/b.txt'), b'same')
+        self.assertEqual(self.store.stats()['count'], 1)
+
+    def test_eviction(self):
+        for i in range(1, 13):
+            self.client.download(self.url % i)
+        stats = self.store.stats()
+        self.assertTrue(stats['size'] <= 1000)
+        self.assertTrue(stats['evictions'] > 0)
+        # The oldest are the ones that got thrown out
+        self.assertEqual(self.store.get(self.url % 1), None)
+        self.assertNotEqual(self.store.get(self.url % 12), None)
+        # The running total agrees with what's there
+        self.assertEqual(stats['size'], 100 * stats['count'])
+        self.store.clear()
+        self.assertEqual(self.store.stats()['size'], 0)
+
+    def test_shared(self):
+        self.client.download(self.url % 1)
+        # Another process using the same directory sees it
+        other = AssetStore(self.path, max_size=1000)
+        self.assertEqual(len(other.get(self.url % 1)), 100)
+        # And copes with it going missing underneath it
+        other.clear()
+        self.assertEqual(self.store.get(self.url % 1), None)
+        self.assertEqual(len(self.client.download(self.url % 1)), 100)
+        self.assertEqual(self.count(), 2)
+        other.close()
+
+
+class MultipartTest(LocalServerMixin, unittest.TestCase):
+    """
+    Tests for streaming uploads, run against a local server.
+    """
+    def setUp(self):
+        super(MultipartTest, self).setUp()
+        self.path = os.path.join(os.path.dirname(__file__), "test.pdf")
+
+    @unittest.skipIf(six.PY2, "Uploads are only streamed in Python 3")
+    def test_stream(self):
+        handler = MultipartPostHandler()
+        v_vars = [('title', 'Test')]
+        with open(self.path, 'rb') as fp:
+            boundary, expected = handler.multipart_encode(
+                v_vars,
+                [('file', fp)]
+            )
+            boundary, body = handler.multipart_stream(
+                v_vars,
+                [('file', fp)],
+                boundary=boundary
+            )
+            self.assertEqual(len(body), len(expected))
+            chunk_list = []
+            while True:
+                chunk = body.read(1000)
+                if not chunk:
+                    break
+                chunk_list.append(chunk)
+            self.assertEqual(b''.join(chunk_list), expected)
+            # It can be rewound and sent again
+            self.assertEqual(b''.join(body), expected)
+
+    def test_upload(self):
+        client = DocumentCloud('user', 'pass', base_uri=self.base_uri)
+        obj = client.documents.upload(self.path, 'Test')
+        self.assertTrue(isinstance(obj, Document))
+        self.assertEqual(obj.title, 'Test')
+        upload = self.get_uploads()[0]
+        with open(self.path, 'rb') as fp:
+            self.assertEqual(upload['file'], hashlib.sha1(fp.read()).hexdigest())
+        self.assertEqual(upload['title'], 'Test')
+
+    def test_upload_directory(self):
+        client = DocumentCloud('user', 'pass', base_uri=self.base_uri)
+        directory = tempfile.mkdtemp()
+        for name in ['a.pdf', 'b.pdf', 'c.pdf', 'fail.pdf', 'notes.txt']:
+            shutil.copy(self.path, os.path.join(directory, name))
+        manifest = os.path.join(directory, 'manifest.json')
+        with self.assertRaises(UploadFailedError) as context:
+            client.documents.upload_directory(
+                directory,
+                workers=3,
+                manifest=manifest
+            )
+        # The failure didn't stop the rest from going up
+        self.assertEqual(len(context.exception.documents), 3)
+        self.assertEqual(len(self.fake.documents), self.corpus_size + 3)
+        fail_path = os.path.join(directory, 'fail.pdf')
+        self.assertEqual(list(context.exception.errors), [fail_path])
+        with open(manifest) as f:
+            manifest_dict = json.load(f)
+        self.assertEqual(len(manifest_dict), 4)
+        self.assertTrue(
+            manifest_dict[os.path.join(directory, 'a.pdf')]['id'] in
+            [obj.id for obj in context.exception.documents]
+        )
+        self.assertEqual(manifest_dict[fail_path]['id'], None)
+        self.assertTrue('422' in manifest_dict[fail_path]['error'])
+
+    def test_ledger(self):
+        client = DocumentCloud('user', 'pass', base_uri=self.base_uri)
+        directory = tempfile.mkdtemp()
+        shutil.copy(self.path, os.path.join(directory, 'a.pdf'))
+        shutil.copy(self.path, os.path.join(directory, 'copy-of-a.pdf'))
+        shutil.copy(
+            os.path.join(os.path.dirname(__file__), "español.pdf"),
+            os.path.join(directory, 'b.pdf')
+        )
+        ledger = UploadLedger(os.path.join(directory, 'ledger.db'))
+        obj_list = client.documents.upload_directory(directory, ledger=ledger)
+        # The copy has the same contents, so it isn't sent twice
+        self.assertEqual(len(obj_list), 3)
+        self.assertEqual(len(self.get_uploads()), 2)
+        self.assertEqual(len(ledger), 2)
+        # Run it again and nothing goes up
+        ledger = UploadLedger(os.path.join(directory, 'ledger.db'))
+        obj_list = client.documents.upload_directory(directory, ledger=ledger)
+        self.assertEqual(len(obj_list), 3)
+        self.assertEqual(len(self.get_uploads()), 2)
+        self.assertEqual(ledger.hits, 3)
+
+    def test_ledger_workers(self):
+        client = DocumentCloud('user', 'pass', base_uri=self.base_uri)
+        directory = tempfile.mkdtemp()
+        for i in range(6):
+            shutil.copy(self.path, os.path.join(directory, '%s.pdf' % i))
+        ledger = UploadLedger(os.path.join(directory, 'ledger.db'))
+        obj_list = client.documents.upload_directory(
+            directory,
+            workers=6,
+            ledger=ledger
+        )
+        # Copies going up at the same time still only go up once
+        self.assertEqual(len(obj_list), 6)
+        self.assertEqual(len(self.get_uploads()), 1)
+        self.assertEqual(ledger.hits, 5)
+        self.assertEqual(ledger._claims, {})
+
+
+class ConstructionTest(unittest.TestCase):
+    """
+    Tests for the quick, lazy Document constructor.
+    """
+    def test_parse_timestamp(self):
+        value_list = [
+            '2018-08-19',
+            '2015-11-20T21:17:08Z',
+            '2015-11-20T21:17:08.123+00:00',
+            '2015-11-20T21:17:08-08:00',
+            'Fri, 20 Nov 2015 21:17:08 +0000',
+            'Fri, 20 Nov 2015 21:17:08 -0700',
+            # Falls back to dateutil
+            'November 20, 2015',
+        ]
+        for value in value_list:
+            self.assertEqual(parse_timestamp(value), dateparser(value))
+
+    def test_lazy(self):
+        obj = Document({
+            'title': "Test Title",
+            'resources': {'pdf': 'http://example.com/test.pdf'},
+            'mentions': [{'page': 1, 'text': 'foo'}],
+            'created_at': '2018-08-19',
+            'updated_at': 'Fri, 20 Nov 2015 21:17:08 +0000',
+        })
+        # Nothing is converted until it's asked for
+        self.assertEqual(obj.__dict__['created_at'], '2018-08-19')
+        self.assertEqual(obj.created_at.year, 2018)
+        self.assertEqual(obj.updated_at.year, 2015)
+        self.assertTrue(obj.created_at is obj.created_at)
+        self.assertEqual(obj.pdf_url, 'http://example.com/test.pdf')
+        obj.related_article = 'http://example.com'
+        self.assertEqual(obj.resources.related_article, 'http://example.com')
+        self.assertTrue(isinstance(obj.mentions[0], Mention))
+        self.assertEqual(Document({'mentions': []}).mentions, None)
+
+    def test_compact(self):
+        d = {
+            'id': '1-test',
+            'title': "Test Title",
+            'access': 'public',
+            'resources': {'pdf': 'http://example.com/test.pdf'},
+            'mentions': [{'page': 1, 'text': 'foo'}],
+            'created_at': '2018-08-19',
+            'updated_at': '2018-08-19',
+        }
+        obj = Document(dict(d))
+        compact = Document.compact(dict(d))
+        self.assertEqual(str(compact), str(obj))
+        for attr in ['id', 'title', 'access', 'created_at', 'pdf_url']:
+            self.assertEqual(getattr(compact, attr), getattr(obj, attr))
+        self.assertTrue(isinstance(compact.resources, Resource))
+        self.assertEqual(compact.resources.related_article, '')
+        self.assertEqual(compact.mentions[0].page, 1)
+        compact.title = 'New Title'
+        self.assertEqual(compact.__dict__['title'], 'New Title')
+
+    def test_memoized(self):
+        obj = Document({
+            'id': '1-test',
+            'data': {'foo': 'bar'},
+            'annotations': [{'title': 'Note', 'location': {'image': '1,2,3,4'}}],
+            'sections': [{'title': 'Part', 'page': 1}],
+        })
+        # Collections are built once and handed back after that
+        self.assertTrue(obj.annotations is obj.annotations)
+        self.assertTrue(isinstance(obj.annotations[0], Annotation))
+        self.assertEqual(obj.annotations[0].location.top, 1)
+        self.assertTrue(obj.sections is obj.sections)
+        self.assertEqual(obj.sections[0].title, 'Part')
+        # Changes to the data dictionary stick around to be saved
+        self.assertTrue(obj.data is obj.data)
+        obj.data['boom'] = 'bap'
+        self.assertEqual(obj.data, {'foo': 'bar', 'boom': 'bap'})
+        with self.assertRaises(TypeError):
+            obj.data['bad'] = 1
+        # Setting them replaces what was built
+        obj.data = {'a': 'b'}
+        self.assertEqual(obj.data, {'a': 'b'})
+        obj.sections = [{'title': 'Other', 'page': 2}]
+        self.assertEqual(obj.sections[0].title, 'Other')
+        obj.annotations = []
+        self.assertEqual(obj.annotations, [])
+
+
+class DocumentSetTest(unittest.TestCase):
+    """
+    Tests for the indexed list of a project's documents.
+    """
+    def setUp(self):
+        self.obj_list = [
+            Document({'id': '%s-test' % i, 'title': 'Test %s' % i})
+            for i in range(5)
+        ]
+
+    def assertIndexed(self, obj_set):
+        self.assertEqual(
+            sorted(obj_set._index),
+            sorted(str(i.id) for i in obj_set)
+        )
+        for obj in obj_set:
+            self.assertTrue(obj_set.get(obj.id) is obj)
+
+    def test_add(self):
+        obj_set = DocumentSet(self.obj_list[:2])
+        obj_set.append(self.obj_list[2])
+        obj_set.insert(0, self.obj_list[3])
+        obj_set += [self.obj_list[4]]
+        self.assertEqual(
+            [i.id for i in obj_set],
+            ['3-test', '0-test', '1-test', '2-test', '4-test']
+        )
+        self.assertIndexed(obj_set)
+        self.assertTrue(self.obj_list[2] in obj_set)
+        self.assertTrue('2-test' in obj_set)
+        self.assertFalse('5-test' in obj_set)
+        self.assertRaises(DuplicateObjectError, obj_set.append, self.obj_list[0])
+        self.assertRaises(TypeError, obj_set.append, "The letter C")
+
+    def test_copies(self):
+        obj = Document({
+            'id': '1-test',
+            'title': 'Test',
+            'data': {'foo': 'bar'},
+            'resources': {'related_article': ''},
+        })
+        obj.title = 'New Title'
+        obj.data['foo'] = 'baz'
+        obj_set = DocumentSet()
+        obj_set.append(obj)
+        copied = obj_set[0]
+        self.assertFalse(copied is obj)
+        # Each keeps its own track of what's waiting to be saved
+        obj._mark_saved()
+        self.assertEqual(obj.get_changes(), {})
+        self.assertEqual(copied.get_changes(), {
+            'title': 'New Title',
+            'data': {'foo': 'baz'},
+        })
+        # And edits to the original don't show up in the copy
+        obj.data['foo'] = 'boom'
+        obj.related_article = 'http://example.com'
+        self.assertEqual(copied.data, {'foo': 'baz'})
+        self.assertEqual(copied.related_article, '')
+        self.assertFalse('related_article' in copied.get_changes())
+        # Nor is it loaded along with the original's batch
+        obj = Document({'id': '2-test', '_batch': [obj]})
+        obj_set.append(obj)
+        self.assertFalse('_batch' in obj_set[1].__dict__)
+
+    def test_extend(self):
+        obj_set = DocumentSet()
+        obj_set.extend(self.obj_list[:3])
+        # A bad batch is rejected as a whole
+        self.assertRaises(
+            DuplicateObjectError,
+            obj_set.extend,
+            [self.obj_list[3], self.obj_list[3]]
+        )
+        self.assertRaises(
+            DuplicateObjectError,
+            obj_set.extend,
+            [self.obj_list[4], self.obj_list[0]]
+        )
+        self.assertEqual(len(obj_set), 3)
+        self.assertIndexed(obj_set)
+
+    def test_remove(self):
+        obj_set = DocumentSet(self.obj_list)
+        obj_set.remove(self.obj_list[1])
+        obj_set.remove('2-test')
+        self.assertRaises(ValueError, obj_set.remove, '2-test')
+        self.assertEqual(obj_set.pop().id, '4-test')
+        del obj_set[0]
+        self.assertEqual([i.id for i in obj_set], ['3-test'])
+        self.assertIndexed(obj_set)
+        obj_set.clear()
+        self.assertEqual(len(obj_set._index), 0)
+
+    def test_slices(self):
+        obj_set = DocumentSet(self.obj_list)
+        sliced = obj_set[1:3]
+        self.assertTrue(isinstance(sliced, DocumentSet))
+        self.assertEqual([i.id for i in sliced], ['1-test', '2-test'])
+        self.assertIndexed(sliced)
+        obj_set[0:2] = [self.obj_list[1], self.obj_list[0]]
+        self.assertEqual(obj_set[0].id, '1-test')
+        self.assertRaises(
+            DuplicateObjectError,
+            obj_set.__setitem__,
+            0,
+            self.obj_list[4]
+        )
+        self.assertEqual(obj_set[0].id, '1-test')
+        del obj_set[::2]
+        self.assertEqual([i.id for i in obj_set], ['0-test', '3-test'])
+        self.assertIndexed(obj_set)
+        self.assertIndexed(copy(obj_set))
+        self.assertIndexed(deepcopy(obj_set))
+
+    def test_get_document(self):
+        obj = Project({'id': 1, 'title': 'Test'})
+        obj.document_list = self.obj_list
+        self.assertEqual(obj.get_document('3-test').title, 'Test 3')
+        self.assertRaises(DoesNotExistError, obj.get_document, '5-test')
+
+
 class ErrorTest(BaseTest):
     """
     Test a lot of the errors.